@@ -0,0 +1,218 @@
+# batch.py
+# Solve many Rubik's cube or pancake problems without the GUI, one JSON record each.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import contextlib
+import json
+import os
+import random
+import signal
+import sys
+import time
+
+import cube
+import kociemba
+import pancakes
+import rubiks
+import search
+
+parser = argparse.ArgumentParser(
+    description="Solve Rubik's cube or pancake problems without the GUI"
+)
+parser.add_argument(
+    "paths",
+    nargs="+",
+    help="state files (like state01.txt) or directories of .txt state files, "
+    "or seeds for shuffling the pancakes",
+)
+parser.add_argument(
+    "--puzzle",
+    choices=["rubiks", "pancakes"],
+    help="solve cubes with the search below, or pancake stacks with GBFS",
+    default="rubiks",
+)
+parser.add_argument(
+    "-n", "--num", metavar="pancakes", type=int, help="number of pancakes", default=8
+)
+parser.add_argument(
+    "--search",
+    choices=["astar", "idastar", "bidirectional", "kociemba"],
+    help="A*, IDA* (less memory), bidirectional A* or two-phase (fast, not optimal)",
+    default="astar",
+)
+parser.add_argument(
+    "--heuristic",
+    choices=["stickers", "corners", "edges", "max"],
+    help="heuristic for the search (pattern databases are built by pattern_db.py)",
+    default="stickers",
+)
+parser.add_argument(
+    "--metric",
+    choices=list(cube.METRICS),
+    help="qtm counts a half turn as two moves, htm as one (pattern databases must match)",
+    default="qtm",
+)
+parser.add_argument(
+    "--endgame",
+    type=int,
+    help="end A* search at states within this many moves of solved (table built by endgame.py)",
+    default=0,
+)
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    help="number of processes solving problems at once; records are written as "
+    "they finish",
+    default=1,
+)
+parser.add_argument(
+    "-t", "--timeout", type=float, help="seconds allowed for each problem"
+)
+parser.add_argument(
+    "-o", "--output", help="JSONL file to write the records to (default: stdout)"
+)
+
+
+def state_files(paths):
+    """Return the state files named by paths, replacing each directory by the
+    .txt files in it, in name order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.endswith(".txt"))
+            files += [os.path.join(path, name) for name in names]
+        else:
+            files.append(path)
+    return files
+
+
+def read_state(filename):
+    """Read a cube state file: one line of 54 sticker colors (digits 0-5) in the
+    layout of cube.py, as given to rubiks.py --state."""
+    with open(filename) as file:
+        state = [int(num) for num in file.readline().strip()]
+    if len(state) != 54 or not set(state) <= set(range(6)):
+        raise ValueError(f"{filename} does not hold 54 sticker colors 0-5")
+    return state
+
+
+def _time_out(signum, frame):
+    raise TimeoutError
+
+
+def measure(record, solve_fn, timeout=None):
+    """Call solve_fn(stats), which returns a solution and may store the nodes it
+    expanded in the stats dict, and add to the record: the solution, its length,
+    the nodes expanded, the wall time in seconds and the peak resident memory of
+    the solving process in bytes (see search.peak_memory), or an error message.
+    The peak is the process's own, so in a single process it includes earlier
+    problems; run() gives each problem a fresh process when it has workers. The
+    solver is stopped after timeout seconds where the platform has interval
+    timers."""
+    stats = {}
+    timer = timeout and hasattr(signal, "setitimer")
+    if timer:
+        signal.signal(signal.SIGALRM, _time_out)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    t = time.perf_counter()
+    try:
+        # The searches report progress on stdout, which may carry the records
+        with contextlib.redirect_stdout(sys.stderr):
+            solution = solve_fn(stats)
+    except TimeoutError:
+        record["error"] = f"timed out after {timeout:g} s"
+    except (OSError, ValueError) as e:
+        record["error"] = str(e)
+    else:
+        record.update(solution=solution, length=len(solution), nodes=stats.get("nodes"))
+        if "status" in stats:
+            record["status"] = stats["status"]  # not "solved" if a budget ran out
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    record["seconds"] = round(time.perf_counter() - t, 3)
+    record["peak_memory"] = search.peak_memory()
+    return record
+
+
+def solve(
+    filename,
+    method="astar",
+    heuristic="stickers",
+    metric="qtm",
+    endgame=0,
+    timeout=None,
+):
+    """Solve the cube in a state file and return its record (see measure())."""
+
+    def solve_fn(stats):
+        state = read_state(filename)
+        if method == "kociemba":
+            return kociemba.solve(state, stats=stats)
+        elif method == "astar":
+            return rubiks.astar(
+                state,
+                heuristic=heuristic,
+                metric=metric,
+                endgame_depth=endgame,
+                stats=stats,
+            )
+        search_fn = {
+            "idastar": rubiks.idastar,
+            "bidirectional": rubiks.bidirectional,
+        }[method]
+        return search_fn(state, heuristic=heuristic, metric=metric, stats=stats)
+
+    return measure({"file": filename}, solve_fn, timeout)
+
+
+def solve_pancakes(seed, num=8, timeout=None):
+    """Shuffle a stack of num pancakes with a seed, solve it with GBFS and return
+    its record (see measure()). The solution lists how many pancakes each flip
+    turns over."""
+    stack = list(range(num))
+    random.Random(seed).shuffle(stack)
+
+    def solve_fn(stats):
+        return pancakes.gbfs(None, stack, verbose=False, stats=stats)
+
+    return measure({"seed": seed, "stack": stack}, solve_fn, timeout)
+
+
+def run(tasks, workers=1, timeout=None):
+    """Yield the record of each task, a (function, *args) tuple, as it finishes.
+    The tasks are independent, so with more than one worker each goes to a new
+    process of a pool, which then exits so its peak memory is the task's alone."""
+    if workers <= 1:
+        for fn, *task_args in tasks:
+            yield fn(*task_args, timeout=timeout)
+        return
+    with ProcessPoolExecutor(workers, max_tasks_per_child=1) as pool:
+        futures = [pool.submit(*task, timeout=timeout) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(args):
+    if args.puzzle == "pancakes":
+        tasks = [(solve_pancakes, int(seed), args.num) for seed in args.paths]
+    else:
+        tasks = [
+            (solve, filename, args.search, args.heuristic, args.metric, args.endgame)
+            for filename in state_files(args.paths)
+        ]
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for record in run(tasks, args.workers, args.timeout):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
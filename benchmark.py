@@ -0,0 +1,244 @@
+# benchmark.py
+# Micro-benchmarks for the building blocks of the cube search.
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+import cube
+import cubie
+import hda
+import heuristics
+import rubiks
+import search
+
+parser = argparse.ArgumentParser(description="Micro-benchmarks for the cube search")
+parser.add_argument(
+    "bench",
+    choices=["moves", "states", "branching", "hda", "heuristic", "zobrist"],
+    help="which benchmark to run",
+    nargs="?",
+    default="moves",
+)
+parser.add_argument(
+    "-n", "--num", type=int, help="number of operations to time", default=200000
+)
+parser.add_argument("--seed", type=int, help="seed for the random move sequence")
+parser.add_argument(
+    "-d",
+    "--depth",
+    type=int,
+    help="deepest level for the branching count, or scramble length for hda",
+    default=12,
+)
+parser.add_argument(
+    "--heuristic",
+    choices=["stickers", "corners", "edges", "max"],
+    help="heuristic for the hda benchmark",
+    default="max",
+)
+
+
+# (src, dst) sticker lists for each move, as the old if/elif chain in rotate had them
+CYCLE_LISTS = {
+    move: (
+        [perm[j] for j in range(54) if perm[j] != j],
+        [j for j in range(54) if perm[j] != j],
+    )
+    for move, perm in cube.PERMUTATIONS.items()
+}
+
+
+def rotate_by_cycles(state, move):
+    """Apply a move the way rubiks.rotate used to: copy the state and assign sticker by sticker."""
+    src, dst = CYCLE_LISTS[move]
+    temp = state.copy()
+    for i, j in zip(src, dst):
+        state[j] = temp[i]
+
+
+def bench_moves(n, seed=None):
+    """Time n random quarter turns with the old sticker loop, the compiled sticker
+    tables on bytes states (cube.apply) and the cubie model."""
+    rng = random.Random(seed)
+    moves = [rng.choice(cube.QUARTER_TURNS) for _ in range(n)]
+    start = [i for i in range(6) for _ in range(9)]
+
+    state = start.copy()
+    t = time.perf_counter()
+    for move in moves:
+        rotate_by_cycles(state, move)
+    before = n / (time.perf_counter() - t)
+
+    state = cube.pack(start)
+    t = time.perf_counter()
+    for move in moves:
+        state = cube.apply(state, move)
+    after = n / (time.perf_counter() - t)
+
+    state = cubie.SOLVED
+    t = time.perf_counter()
+    for move in moves:
+        state = cubie.apply(state, move)
+    cubies = n / (time.perf_counter() - t)
+
+    print(f"sticker loop:   {before:12,.0f} moves/s")
+    print(f"bytes table:    {after:12,.0f} moves/s ({after / before:.1f}x)")
+    print(f"cubie state:    {cubies:12,.0f} moves/s ({cubies / before:.1f}x)")
+
+
+def bench_states(n, seed=None):
+    """Compare the memory used to store n distinct random states as lists, tuples and bytes."""
+    rng = random.Random(seed)
+    states = {cube.SOLVED}
+    state = cube.SOLVED
+    while len(states) < n:
+        state = cube.apply(state, rng.choice(cube.QUARTER_TURNS))
+        states.add(state)
+
+    # small ints are shared, so only the containers themselves count
+    for name, convert in [
+        ("list", list),
+        ("tuple", tuple),
+        ("bytes", bytes),
+        ("cubies", cubie.from_stickers),
+    ]:
+        size = sum(sys.getsizeof(convert(s)) for s in states)
+        print(f"{name:6} {size / n:6.0f} bytes/state")
+
+
+def bench_branching(depth):
+    """Count the move sequences of each length (in quarter turns) that a search
+    generates when it only avoids undoing the last move, and with cube.SUCCESSORS."""
+    costs = cube.METRICS["qtm"]
+    # ending[c][m]: canonical sequences of cost c whose last move is m
+    ending = [[0] * len(cube.MOVES) for _ in range(depth + 1)]
+    for c in range(1, depth + 1):
+        for move in range(len(cube.MOVES)):
+            if costs[move] <= c:
+                before = ending[c - costs[move]]
+                if c == costs[move]:
+                    ending[c][move] = 1
+                else:
+                    ending[c][move] = sum(
+                        before[last]
+                        for last in range(len(cube.MOVES))
+                        if move in cube.SUCCESSORS[last]
+                    )
+
+    print(f"{'depth':>5} {'no undo':>16} {'canonical':>16}")
+    for c in range(1, depth + 1):
+        before = 12 * 11 ** (c - 1)
+        after = sum(ending[c])
+        print(f"{c:5} {before:16,} {after:16,} ({before / after:.1f}x fewer)")
+
+
+def bench_hda(depth, heuristic="max", seed=None):
+    """Time hash-distributed A* on one scrambled cube with 1, 2, 4 and 8 workers
+    and report each speedup over one worker."""
+    rng = random.Random(seed)
+    state = cube.SOLVED
+    for _ in range(depth):
+        state = cube.apply(state, rng.choice(cube.QUARTER_TURNS))
+
+    print(f"{os.cpu_count()} cores")
+    print(f"{'workers':>7} {'seconds':>8} {'nodes':>10} {'speedup':>8}")
+    for workers in (1, 2, 4, 8):
+        stats = {}
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            hda.astar(list(state), workers, heuristic=heuristic, stats=stats)
+        seconds = time.perf_counter() - t
+        if workers == 1:
+            one = seconds
+        print(f"{workers:7} {seconds:8.2f} {stats['nodes']:10,} {one / seconds:7.2f}x")
+
+
+def bench_heuristic(n, seed=None):
+    """Check over a walk of n random moves that the sticker heuristic updated from
+    the parent's value (see cube.MisplacedCounter) always equals rubiks.cost()
+    of the child, and time both."""
+    rng = random.Random(seed)
+    moves = [rng.choice(cube.MOVES) for _ in range(n)]
+    states = [cube.SOLVED]
+    for move in moves:
+        states.append(cube.apply(states[-1], move))
+
+    t = time.perf_counter()
+    full = [rubiks.cost("", state) for state in states[1:]]
+    before = n / (time.perf_counter() - t)
+
+    t = time.perf_counter()
+    count = heuristics.MISPLACED.count(states[0])
+    incremental = []
+    for state, move in zip(states, moves):
+        count = heuristics.MISPLACED.after(state, count, move)
+        incremental.append(count / 6)
+    after = n / (time.perf_counter() - t)
+
+    for i, (h, expected) in enumerate(zip(incremental, full)):
+        if h != expected:
+            raise AssertionError(
+                f"move {i + 1} ({moves[i]}): incremental h = {h}, cost() gives {expected}"
+            )
+    print(f"incremental h equals cost() for all {n:,} moves")
+    print(f"full rescan:  {before:12,.0f} states/s")
+    print(f"incremental:  {after:12,.0f} states/s ({after / before:.1f}x)")
+
+
+def bench_zobrist(n, seed=None):
+    """Check over a walk of n random moves that the Zobrist hash updated move by
+    move equals the hash of the whole state, and time closed-list lookups keyed
+    by the state bytes and by the updated hash."""
+    rng = random.Random(seed)
+    moves = [rng.choice(cube.MOVES) for _ in range(n)]
+    zob = search.Zobrist(54, 6)
+    states, hashes = [cube.SOLVED], [zob.hash(cube.SOLVED)]
+    for move in moves:
+        hashes.append(zob.update(hashes[-1], states[-1], *cube.CHANGES[move]))
+        states.append(cube.apply(states[-1], move))
+    for i, state in enumerate(states):
+        if hashes[i] != zob.hash(state):
+            raise AssertionError(f"move {i}: updated hash differs from zob.hash()")
+
+    visited = set(states[::2])
+    t = time.perf_counter()
+    for state, move in zip(states, moves):
+        cube.apply(state, move) in visited  # a new bytes object hashes once
+    before = n / (time.perf_counter() - t)
+
+    zobrist = search.ZobristSet()
+    for h, state in zip(hashes[::2], states[::2]):
+        zobrist.add(h, state)
+    t = time.perf_counter()
+    for h, state, move in zip(hashes, states, moves):
+        zobrist.contains(
+            zob.update(h, state, *cube.CHANGES[move]), cube.apply(state, move)
+        )
+    after = n / (time.perf_counter() - t)
+
+    print(f"updated hash equals the full hash for all {n:,} moves")
+    print(f"bytes keys:   {before:12,.0f} lookups/s")
+    print(f"zobrist keys: {after:12,.0f} lookups/s ({after / before:.1f}x)")
+
+
+def main(args):
+    if args.bench == "moves":
+        bench_moves(args.num, args.seed)
+    elif args.bench == "states":
+        bench_states(args.num, args.seed)
+    elif args.bench == "branching":
+        bench_branching(args.depth)
+    elif args.bench == "hda":
+        bench_hda(args.depth, args.heuristic, args.seed)
+    elif args.bench == "heuristic":
+        bench_heuristic(args.num, args.seed)
+    elif args.bench == "zobrist":
+        bench_zobrist(args.num, args.seed)
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
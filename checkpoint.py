@@ -0,0 +1,116 @@
+# checkpoint.py
+# Saving an A* search to a file, so it can go on after the process is killed.
+
+from itertools import islice
+import json
+import os
+import struct
+
+import search
+
+MAGIC = b"ASTAR\x00\x00\x02"
+CHUNK = 65536  # open list items or closed-list keys written or read at a time
+
+
+def save(filename, header, nodes, pq, visited, fmt):
+    """Write a search to a file and return its size in bytes: the header (a dict
+    of the search options and counters), the node table, the open list items
+    (packed with the struct format fmt) and the closed list (a set of equal-length
+    bytes keys or a search.BloomFilter). Each part is written as it is read, so
+    saving takes little memory beyond the search's own, and the run files of a
+    search.SpillingOpenList are copied as they are. The file is written beside
+    the old one and then renamed over it, so a kill during the write leaves the
+    last checkpoint whole."""
+    if isinstance(visited, search.BloomFilter):
+        closed = {"kind": "bloom", "blocks": visited.blocks, "k": visited.k}
+    elif isinstance(visited, set):
+        closed = {"kind": "set", "key": len(next(iter(visited), b""))}
+    else:
+        raise ValueError(f"can't save a closed list of type {type(visited).__name__}")
+    if isinstance(pq, search.SpillingOpenList):
+        items, runs = pq.memory_items(), pq.runs()
+    else:
+        items, runs = pq.items(), []
+    header = dict(
+        header,
+        nodes=len(nodes),
+        items=len(pq) - sum(runs),
+        runs=runs,
+        closed=closed,
+        added=len(visited),
+    )
+    record = struct.Struct("<" + fmt)
+
+    data = json.dumps(header).encode()
+    temp = filename + ".tmp"
+    with open(temp, "wb") as file:
+        file.write(MAGIC + struct.pack("<I", len(data)) + data)
+        nodes.parents.tofile(file)
+        file.write(nodes.moves)
+        while chunk := list(islice(items, CHUNK)):
+            file.write(b"".join(record.pack(*item) for item in chunk))
+        if runs:
+            pq.copy_runs(file)
+        if closed["kind"] == "bloom":
+            file.write(visited.bits)
+        else:
+            keys = iter(visited)
+            while chunk := list(islice(keys, CHUNK)):
+                file.write(b"".join(chunk))
+    os.replace(temp, filename)
+    return os.path.getsize(filename)
+
+
+def load(filename, pq, fmt):
+    """Read a file written by save(), push its open list items back onto pq and
+    return the header, the node table and the closed list. Saved run files go
+    back to disk as they are if pq is a search.SpillingOpenList."""
+    with open(filename, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a search checkpoint")
+        (length,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(length))
+
+        nodes = search.NodeTable()
+        n = header["nodes"]
+        nodes.parents.fromfile(file, n)
+        nodes.moves = bytearray(n)
+        file.readinto(nodes.moves)
+
+        record = struct.Struct("<" + fmt)
+        left = header["items"]
+        while left:
+            data = file.read(min(left, CHUNK) * record.size)
+            if not data:
+                raise ValueError(f"{filename} ends early")
+            for item in record.iter_unpack(data):
+                _, g, h, _ = item
+                pq.push(item, g + h, g, h)
+            left -= len(data) // record.size
+        spilled = struct.Struct("<dd" + fmt)  # a key, then the item
+        for count in header["runs"]:
+            if isinstance(pq, search.SpillingOpenList):
+                pq.add_run(file, count)
+                continue
+            while count:
+                data = file.read(min(count, CHUNK) * spilled.size)
+                if not data:
+                    raise ValueError(f"{filename} ends early")
+                for entry in spilled.iter_unpack(data):
+                    _, g, h, _ = item = entry[2:]
+                    pq.push(item, g + h, g, h)
+                count -= len(data) // spilled.size
+
+        closed = header["closed"]
+        if closed["kind"] == "bloom":
+            visited = search.BloomFilter.__new__(search.BloomFilter)  # sized as saved
+            visited.blocks, visited.k = closed["blocks"], closed["k"]
+            visited.bits = bytearray(visited.blocks * search.BloomFilter.BLOCK // 8)
+            file.readinto(visited.bits)
+            visited._len = header["added"]
+        else:
+            k = closed["key"]
+            visited = set()
+            while k and (data := file.read(CHUNK * k)):
+                visited.update(data[i : i + k] for i in range(0, len(data), k))
+    return header, nodes, visited
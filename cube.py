@@ -0,0 +1,263 @@
+# cube.py
+# Precompiled move tables for the 3x3 Rubik's cube, shared by rubiks.py and rubiks_bonus.py.
+
+from operator import itemgetter, ne
+
+# Stickers are numbered 0-53, nine per face in the order U, L, F, R, B, D (the
+# same layout drawn by guisetup and read from --state files). The GUI keeps a
+# list of color indices; the search uses a compact, hashable 54-byte string.
+FACES = "UDLRBF"
+SOLVED = bytes(i for i in range(6) for _ in range(9))
+
+# Moves use the search notation from simulate(): a lowercase letter turns that
+# face clockwise, an uppercase letter turns it counterclockwise, and a face
+# followed by "2" is a half turn.
+QUARTER_TURNS = "UuDdLlRrBbFf"
+HALF_TURNS = ("U2", "D2", "L2", "R2", "B2", "F2")
+
+# The moves the searches choose from, numbered in this order: quarter turns,
+# where moves m and m ^ 1 undo each other, then half turns
+MOVES = list(QUARTER_TURNS) + list(HALF_TURNS)
+
+# Each move spelled with quarter turns only ("U2" is "uu"), as in the solution
+# strings simulate() and the GUI play back
+SPELLINGS = [move if len(move) == 1 else move[0].lower() * 2 for move in MOVES]
+
+# What each move costs under each metric: "qtm" counts a half turn as two
+# quarter turns, "htm" counts every face turn as one move
+METRICS = {"qtm": [1] * 12 + [2] * 6, "htm": [1] * 18}
+
+# For each face, the stickers moved by a clockwise quarter turn (src) and where
+# each of them ends up (dst). Every other move is derived from these.
+# fmt: off
+CYCLES = {
+    "U": ([9, 10, 11, 18, 19, 20, 27, 28, 29, 36, 37, 38, 0, 1, 2, 5, 8, 7, 6, 3],
+          [36, 37, 38, 9, 10, 11, 18, 19, 20, 27, 28, 29, 2, 5, 8, 7, 6, 3, 0, 1]),
+    "D": ([45, 46, 47, 50, 53, 52, 51, 48, 15, 16, 17, 24, 25, 26, 33, 34, 35, 42, 43, 44],
+          [47, 50, 53, 52, 51, 48, 45, 46, 24, 25, 26, 33, 34, 35, 42, 43, 44, 15, 16, 17]),
+    "L": ([0, 3, 6, 18, 21, 24, 45, 48, 51, 38, 41, 44, 9, 10, 11, 12, 14, 15, 16, 17],
+          [18, 21, 24, 45, 48, 51, 44, 41, 38, 6, 3, 0, 11, 14, 17, 10, 16, 9, 12, 15]),
+    "R": ([2, 5, 8, 20, 23, 26, 47, 50, 53, 36, 39, 42, 27, 28, 29, 30, 32, 33, 34, 35],
+          [42, 39, 36, 2, 5, 8, 20, 23, 26, 53, 50, 47, 29, 32, 35, 28, 34, 27, 30, 33]),
+    "B": ([36, 37, 38, 41, 44, 43, 42, 39, 2, 1, 0, 9, 12, 15, 51, 52, 53, 35, 32, 29],
+          [38, 41, 44, 43, 42, 39, 36, 37, 9, 12, 15, 51, 52, 53, 35, 32, 29, 2, 1, 0]),
+    "F": ([18, 19, 20, 23, 26, 25, 24, 21, 6, 7, 8, 27, 30, 33, 47, 46, 45, 17, 14, 11],
+          [20, 23, 26, 25, 24, 21, 18, 19, 27, 30, 33, 47, 46, 45, 17, 14, 11, 6, 7, 8]),
+}
+# fmt: on
+
+# The stickers of each corner and edge position, in the usual cubie order:
+# corners URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB and edges UR, UF, UL, UB, DR,
+# DF, DL, DB, FR, FL, BL, BR. A corner lists its U/D sticker first and then goes
+# clockwise; an edge lists its U/D sticker first, or its F/B sticker for the
+# four middle-layer edges.
+# fmt: off
+CORNER_FACELETS = ((8, 27, 20), (6, 18, 11), (0, 9, 38), (2, 36, 29),
+                   (47, 26, 33), (45, 17, 24), (51, 44, 15), (53, 35, 42))
+EDGE_FACELETS = ((5, 28), (7, 19), (3, 10), (1, 37), (50, 34), (46, 25),
+                 (48, 16), (52, 43), (23, 30), (21, 14), (41, 12), (39, 32))
+# fmt: on
+
+
+def _compile(src, dst):
+    """Turn a (src, dst) sticker cycle into a gather permutation: new[j] = old[perm[j]]."""
+    perm = list(range(54))
+    for i, j in zip(src, dst):
+        perm[j] = i
+    return tuple(perm)
+
+
+def _inverse(perm):
+    """Return the permutation that undoes perm."""
+    inv = [0] * len(perm)
+    for j, i in enumerate(perm):
+        inv[i] = j
+    return tuple(inv)
+
+
+def _compose(first, second):
+    """Return the permutation equivalent to applying first and then second."""
+    return tuple(first[i] for i in second)
+
+
+# Gather permutations for all 18 moves, compiled once at import
+PERMUTATIONS = {}
+for _face, (_src, _dst) in CYCLES.items():
+    _cw = _compile(_src, _dst)
+    PERMUTATIONS[_face.lower()] = _cw
+    PERMUTATIONS[_face] = _inverse(_cw)
+    PERMUTATIONS[_face + "2"] = _compose(_cw, _cw)
+
+# The move that undoes each move
+INVERSES = {move: move.swapcase() if len(move) == 1 else move for move in PERMUTATIONS}
+
+# The move number (index into MOVES) that undoes each move number
+UNDO = [MOVES.index(INVERSES[move]) for move in MOVES]
+
+# itemgetter does the whole gather in C
+_GETTERS = {move: itemgetter(*perm) for move, perm in PERMUTATIONS.items()}
+
+
+def pack(stickers):
+    """Return the compact form of a cube state: one byte per sticker color."""
+    return bytes(stickers)
+
+
+def unpack(state):
+    """Return the list form of a compact state, as used by recolor and the GUI."""
+    return list(state)
+
+
+def normalize(stickers):
+    """Return the compact state with colors relabeled so that the center of face i
+    has color i, as in SOLVED. The centers never move, so this does not change
+    which moves solve the cube."""
+    table = bytearray(range(256))
+    for face in range(6):
+        table[stickers[face * 9 + 4]] = face
+    return bytes(stickers).translate(table)
+
+
+def move_name(face, direction="CW"):
+    """Return the search-notation name of turning a face (U/D/L/R/B/F) CW, CCW or 180."""
+    if direction == "CW":
+        return face.lower()
+    elif direction == "CCW":
+        return face.upper()
+    elif direction == "180":
+        return face.upper() + "2"
+    raise ValueError(f"unknown direction {direction!r}")
+
+
+def apply(state, move):
+    """Return the new compact state after applying one move to a state."""
+    return bytes(_GETTERS[move](state))
+
+
+def apply_inplace(state, move):
+    """Apply one move to a bytearray state in place; INVERSES[move] undoes it."""
+    state[:] = _GETTERS[move](state)
+
+
+# The stickers each move changes, and the stickers their new colors come from
+CHANGES = {
+    move: (
+        [j for j, k in enumerate(perm) if k != j],
+        [k for j, k in enumerate(perm) if k != j],
+    )
+    for move, perm in PERMUTATIONS.items()
+}
+
+
+class MisplacedCounter:
+    """Counts the stickers of a normalized state, among a fixed set of them, whose
+    color differs from SOLVED. After a move the count can be updated from the
+    stickers the move touches alone, instead of looking at all of them again."""
+
+    def __init__(self, stickers=range(54)):
+        self.stickers = stickers = sorted(set(stickers))
+        self._all = itemgetter(*stickers)
+        self._home = tuple(SOLVED[j] for j in stickers)
+        # move -> (getter for the counted stickers it changes, getter for the
+        # stickers that replace them, and their SOLVED colors)
+        self._moves = {}
+        for move, perm in PERMUTATIONS.items():
+            touched = [j for j in stickers if perm[j] != j]
+            self._moves[move] = (
+                itemgetter(*touched),
+                itemgetter(*(perm[j] for j in touched)),
+                tuple(SOLVED[j] for j in touched),
+            )
+
+    def count(self, state):
+        """Return the number of counted stickers of a state that are misplaced."""
+        return sum(map(ne, self._all(state), self._home))
+
+    def after(self, state, count, move):
+        """Return the count of the state reached by applying move to a state whose
+        count is given, without applying the move."""
+        before, after, home = self._moves[move]
+        return (
+            count - sum(map(ne, before(state), home)) + sum(map(ne, after(state), home))
+        )
+
+
+def _face(move):
+    """Return the index in FACES of the face a move number turns."""
+    return move // 2 if move < 12 else move - 12
+
+
+# The move numbers allowed after each move number in a canonical sequence.
+# Turning the same face twice in a row is never needed, since two turns of one
+# face are a single turn (or none), and two opposite faces commute, so only the
+# order they have in FACES is allowed (U before D, L before R, B before F).
+SUCCESSORS = {
+    last: [
+        move
+        for move in range(len(MOVES))
+        if _face(move) != _face(last)
+        and not (_face(move) // 2 == _face(last) // 2 and _face(move) < _face(last))
+    ]
+    for last in range(len(MOVES))
+}
+_FIRST_MOVES = list(range(len(MOVES)))
+
+
+def successors(last=None):
+    """Return the move numbers that may follow move number last; any move may
+    follow None (or anything else that is not a move number, like a root marker)."""
+    return SUCCESSORS.get(last, _FIRST_MOVES)
+
+
+def _symmetries():
+    """Return the 48 symmetries of the cube as gather permutations of the stickers:
+    the 24 whole-cube rotations, each with and without a left-right mirror image."""
+    # Turning the whole cube like u is u, D and the middle layer between them;
+    # turning it like r is r, L and the middle layer between them
+    y = _compose(
+        _compose(PERMUTATIONS["u"], PERMUTATIONS["D"]),
+        _compile([12, 13, 14, 21, 22, 23, 30, 31, 32, 39, 40, 41],
+                 [39, 40, 41, 12, 13, 14, 21, 22, 23, 30, 31, 32]),
+    )  # fmt: skip
+    x = _compose(
+        _compose(PERMUTATIONS["r"], PERMUTATIONS["L"]),
+        _compile([1, 4, 7, 19, 22, 25, 46, 49, 52, 37, 40, 43],
+                 [43, 40, 37, 1, 4, 7, 19, 22, 25, 52, 49, 46]),
+    )  # fmt: skip
+    # The mirror image swaps the L and R faces and reverses the columns of every face
+    swap = (0, 3, 2, 1, 4, 5)
+    mirror = tuple(swap[j // 9] * 9 + j % 9 // 3 * 3 + 2 - j % 3 for j in range(54))
+
+    found = {tuple(range(54))}
+    frontier = list(found)
+    while frontier:
+        perm = frontier.pop()
+        for turn in (x, y, mirror):
+            new = _compose(perm, turn)
+            if new not in found:
+                found.add(new)
+                frontier.append(new)
+    return sorted(found)
+
+
+# The 48 symmetries (the identity first), computed once at import
+SYMMETRIES = _symmetries()
+
+
+def _recoloring(perm):
+    """Return the bytes.translate() table that gives the centers of a normalized
+    state back their SOLVED colors after gathering its stickers with perm."""
+    table = bytearray(range(256))
+    for face in range(6):
+        table[perm[face * 9 + 4] // 9] = face
+    return bytes(table)
+
+
+_SYMMETRY_GETTERS = [(itemgetter(*perm), _recoloring(perm)) for perm in SYMMETRIES]
+
+
+def canonical(state):
+    """Return the representative of a normalized state's symmetry class: the least
+    of the 48 states seen by turning or mirroring the whole cube and recoloring it.
+    Each symmetry maps moves to moves, so all 48 are equally far from SOLVED."""
+    return min(bytes(get(state)).translate(table) for get, table in _SYMMETRY_GETTERS)
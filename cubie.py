@@ -0,0 +1,209 @@
+# cubie.py
+# Cubie-level model of the Rubik's cube: where each corner and edge is and how it is turned.
+
+import cube
+
+# A cubie state is 20 bytes, one per cubie: corners URF..DRB, then edges UR..BR
+# (the order of cube.CORNER_FACELETS and cube.EDGE_FACELETS). Each byte records
+# where that cubie's reference sticker is (its U/D sticker, or its F/B sticker
+# for the four middle-layer edges): position * 3 + twist for a corner and
+# 24 + position * 2 + flip for an edge. Every move then maps each possible byte
+# to a new one, so applying it is a single bytes.translate().
+SOLVED = bytes([p * 3 for p in range(8)] + [24 + p * 2 for p in range(12)])
+
+# Home cubie of each sticker color triple/pair, read starting from the
+# reference sticker
+_CORNER_BY_COLORS = {
+    tuple(f // 9 for f in facelets): k
+    for k, facelets in enumerate(cube.CORNER_FACELETS)
+}
+_EDGE_BY_COLORS = {
+    tuple(f // 9 for f in facelets): k for k, facelets in enumerate(cube.EDGE_FACELETS)
+}
+
+
+def _cubie_moves(facelets, orientations):
+    """For each move, the position each cubie position receives its cubie from and
+    how much that cubie's orientation changes, derived from cube.PERMUTATIONS."""
+    home = {f: (k, i) for k, fs in enumerate(facelets) for i, f in enumerate(fs)}
+    moves = {}
+    for move in cube.PERMUTATIONS:
+        labels = cube.apply(range(54), move)  # sticker j now shows sticker labels[j]
+        src, turn = zip(*(home[labels[fs[0]]] for fs in facelets))
+        moves[move] = (list(src), [-i % orientations for i in turn])
+    return moves
+
+
+# move -> (source position of each corner position, twist added to it)
+CORNER_MOVES = _cubie_moves(cube.CORNER_FACELETS, 3)
+# move -> (source position of each edge position, flip added to it)
+EDGE_MOVES = _cubie_moves(cube.EDGE_FACELETS, 2)
+
+
+def _translation(move):
+    """Return the bytes.translate() table that applies a move to a cubie state."""
+    table = bytearray(range(256))
+    src, twist = CORNER_MOVES[move]
+    for p, (q, t) in enumerate(zip(src, twist)):
+        for o in range(3):
+            table[q * 3 + o] = p * 3 + (o + t) % 3
+    src, flip = EDGE_MOVES[move]
+    for p, (q, f) in enumerate(zip(src, flip)):
+        for o in range(2):
+            table[24 + q * 2 + o] = 24 + p * 2 + (o ^ f)
+    return bytes(table)
+
+
+# Per-move transition tables, compiled once at import
+TABLES = {move: _translation(move) for move in cube.PERMUTATIONS}
+
+
+def apply(state, move):
+    """Return the new cubie state after applying one move (in cube.py notation)."""
+    return state.translate(TABLES[move])
+
+
+def apply_inplace(state, move):
+    """Apply one move to a bytearray cubie state in place; cube.INVERSES[move] undoes it."""
+    state[:] = state.translate(TABLES[move])
+
+
+def corners(state):
+    """Return (perm, twist) lists indexed by corner position: which corner is
+    there and how it is twisted."""
+    perm, twist = [0] * 8, [0] * 8
+    for k in range(8):
+        p, t = divmod(state[k], 3)
+        perm[p] = k
+        twist[p] = t
+    return perm, twist
+
+
+def edges(state):
+    """Return (perm, flip) lists indexed by edge position: which edge is there and
+    whether it is flipped."""
+    perm, flip = [0] * 12, [0] * 12
+    for k in range(12):
+        p, f = divmod(state[8 + k] - 24, 2)
+        perm[p] = k
+        flip[p] = f
+    return perm, flip
+
+
+def from_stickers(stickers):
+    """Return the cubie state of a normalized sticker state (see cube.normalize).
+    Raises ValueError if the stickers do not describe a solvable cube."""
+    state = bytearray(20)
+    seen = set()
+    try:
+        for p, facelets in enumerate(cube.CORNER_FACELETS):
+            colors = [stickers[f] for f in facelets]
+            t = 0 if colors[0] in (0, 5) else 1 if colors[1] in (0, 5) else 2
+            k = _CORNER_BY_COLORS[tuple(colors[t:] + colors[:t])]
+            state[k] = p * 3 + t
+            seen.add(k)
+        for p, (a, b) in enumerate(cube.EDGE_FACELETS):
+            if (stickers[a], stickers[b]) in _EDGE_BY_COLORS:
+                k, f = _EDGE_BY_COLORS[stickers[a], stickers[b]], 0
+            else:
+                k, f = _EDGE_BY_COLORS[stickers[b], stickers[a]], 1
+            state[8 + k] = 24 + p * 2 + f
+            seen.add(8 + k)
+    except KeyError:
+        raise ValueError("the stickers do not form valid corners and edges")
+    if len(seen) != 20:
+        raise ValueError("a corner or edge appears twice")
+
+    state = bytes(state)
+    cp, co = corners(state)
+    ep, eo = edges(state)
+    if sum(co) % 3 or sum(eo) % 2 or _parity(cp) != _parity(ep):
+        raise ValueError(
+            "the cube cannot be solved (twisted corner, flipped edge or swap)"
+        )
+    return state
+
+
+def to_stickers(state):
+    """Return the normalized sticker state (54 bytes) of a cubie state."""
+    stickers = bytearray(cube.SOLVED)
+    for cubies, facelets in (
+        (range(8), cube.CORNER_FACELETS),
+        (range(8, 20), cube.EDGE_FACELETS),
+    ):
+        size = len(facelets[0])
+        for k in cubies:
+            home = facelets[k % 8 if size == 3 else k - 8]
+            p, o = divmod(state[k] - (24 if size == 2 else 0), size)
+            for i, f in enumerate(home):
+                stickers[facelets[p][(o + i) % size]] = f // 9
+    return bytes(stickers)
+
+
+def _parity(perm):
+    """Return 0 for an even permutation and 1 for an odd one."""
+    return sum(a > b for i, a in enumerate(perm) for b in perm[i + 1 :]) % 2
+
+
+# The byte value of each corner and edge sticker location: position * 3 + turn
+# for corners and 24 + position * 2 + flip for edges, as in a cubie state
+_LOCATIONS = {}
+for _p, _fs in enumerate(cube.CORNER_FACELETS):
+    _LOCATIONS.update((f, _p * 3 + o) for o, f in enumerate(_fs))
+for _p, _fs in enumerate(cube.EDGE_FACELETS):
+    _LOCATIONS.update((f, 24 + _p * 2 + o) for o, f in enumerate(_fs))
+
+
+def _relocation(perm):
+    """Return the bytes.translate() table that moves every sticker location the way
+    the sticker gather permutation perm (a move or symmetry from cube.py) does."""
+    table = bytearray(range(256))
+    for j, i in enumerate(perm):
+        if i in _LOCATIONS:
+            table[_LOCATIONS[i]] = _LOCATIONS[j]
+    return bytes(table)
+
+
+# For each byte value of a cubie state, where that cubie's stickers are, starting
+# from its reference sticker. Joined in state order, these give the table that
+# moves every sticker location as the state does.
+_STICKERS = [bytes(v // 3 * 3 + (v + i) % 3 for i in range(3)) for v in range(24)] + [
+    bytes(v - v % 2 + (v % 2 ^ i) for i in range(2)) for v in range(24, 48)
+]
+_UNUSED = bytes(range(48, 256))
+
+# For each symmetry S of cube.SYMMETRIES: where the inverse of S puts the
+# reference sticker of each cubie, and the table that moves locations as S does
+_SYMMETRIES = [
+    (SOLVED.translate(_relocation(cube._inverse(perm))), _relocation(perm))
+    for perm in cube.SYMMETRIES
+]
+
+
+def _relocation_of(state):
+    """Return the bytes.translate() table that moves every sticker location the way
+    the moves leading to a cubie state do."""
+    return b"".join(map(_STICKERS.__getitem__, state)) + _UNUSED
+
+
+def compose(first, second):
+    """Return the cubie state reached by the moves leading to first and then the
+    moves leading to second."""
+    return first.translate(_relocation_of(second))
+
+
+def inverse(state):
+    """Return the cubie state reached by undoing the moves leading to state, so
+    that compose(state, inverse(state)) is SOLVED."""
+    table = bytearray(range(256))
+    for i, j in enumerate(_relocation_of(state)[:48]):
+        table[j] = i
+    return SOLVED.translate(table)
+
+
+def canonical(state):
+    """Return the representative of a cubie state's symmetry class (see
+    cube.canonical): the least of S^-1, then the state, then S over all 48
+    symmetries S, each of which is two bytes.translate() calls."""
+    table = _relocation_of(state)
+    return min(start.translate(table).translate(end) for start, end in _SYMMETRIES)
@@ -0,0 +1,118 @@
+# endgame.py
+# Lookup table of the Rubik's cube states near solved, so searches can stop early.
+
+import argparse
+import os
+import time
+
+import cubie
+import pattern_db
+
+parser = argparse.ArgumentParser(
+    description="Build the table of cube states near solved for the A* search"
+)
+parser.add_argument(
+    "-k",
+    "--depth",
+    type=int,
+    help="how many moves from solved the table reaches",
+    default=6,
+)
+parser.add_argument(
+    "-m",
+    "--metric",
+    choices=list(pattern_db.METRICS),
+    help="moves the distances count (qtm: quarter turns, htm: quarter and half turns)",
+    default="qtm",
+)
+
+# Each record is a canonical cubie state (see cubie.canonical) and its distance
+RECORD = len(cubie.SOLVED) + 1
+
+
+def build(depth=6, metric="qtm", filename=None, verbose=True):
+    """Find every cubie state within depth moves of solved by breadth-first search
+    and save one state per symmetry class with its distance. Symmetric states are
+    equally far from solved, and so are their neighbors, so the search can run on
+    canonical states alone."""
+    moves = pattern_db.METRICS[metric]
+    dist = {cubie.SOLVED: 0}
+    frontier = [cubie.SOLVED]
+    t = time.perf_counter()
+    for d in range(1, depth + 1):
+        if verbose:
+            print(
+                f"depth {d - 1}: {len(frontier):,} states ({time.perf_counter() - t:.0f} s)"
+            )
+        next_frontier = []
+        for state in frontier:
+            for move in moves:
+                child = cubie.canonical(cubie.apply(state, move))
+                if child not in dist:
+                    dist[child] = d
+                    next_frontier.append(child)
+        frontier = next_frontier
+
+    filename = filename or table_path(depth, metric)
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "wb") as file:
+        file.write(b"".join(state + bytes([d]) for state, d in dist.items()))
+    return filename
+
+
+def table_path(depth, metric="qtm"):
+    """Return the default filename of a near-solved table."""
+    return os.path.join(pattern_db.TABLES, f"endgame{depth}-{metric}.tbl")
+
+
+class EndgameTable:
+    """The exact distance to solved of every cubie state within depth moves of it,
+    loaded into a dict from a file written by build()."""
+
+    def __init__(self, depth=6, metric="qtm"):
+        filename = table_path(depth, metric)
+        if not os.path.exists(filename):
+            raise FileNotFoundError(
+                f"{filename} not found; build it with: "
+                f"python endgame.py -k {depth} -m {metric}"
+            )
+        with open(filename, "rb") as file:
+            data = file.read()
+        self.depth = depth
+        self.moves = pattern_db.METRICS[metric]
+        self._dist = {
+            data[i : i + RECORD - 1]: data[i + RECORD - 1]
+            for i in range(0, len(data), RECORD)
+        }
+
+    def __len__(self):
+        return len(self._dist)
+
+    def distance(self, state):
+        """Return how many moves a cubie state is from solved, or None if that is
+        more than depth."""
+        return self._dist.get(cubie.canonical(state))
+
+    def solution(self, state):
+        """Return the moves (in cube.py notation) that solve a cubie state within
+        depth moves of solved, found by stepping to a neighbor one move closer."""
+        d = self.distance(state)
+        path = []
+        while d:
+            for move in self.moves:
+                child = cubie.apply(state, move)
+                if self.distance(child) == d - 1:
+                    break
+            path.append(move)
+            state, d = child, d - 1
+        return path
+
+
+def main(args):
+    t = time.perf_counter()
+    filename = build(args.depth, args.metric)
+    print(f"wrote {filename} in {time.perf_counter() - t:.0f} s")
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
@@ -0,0 +1,126 @@
+# expand.py
+# Batched A* for the Rubik's cube: blocks of nodes expanded at once with numpy.
+
+import time
+
+import numpy as np
+
+import cube
+import cubie
+import heuristics
+import search
+import solver
+
+# Row m applies cube.MOVES[m]: sticker states are gathered by position, and
+# cubie states are mapped byte by byte (see cubie.TABLES)
+STICKER_MOVES = np.array(
+    [cube.PERMUTATIONS[move] for move in cube.MOVES], dtype=np.intp
+)
+CUBIE_MOVES = np.array(
+    [list(cubie.TABLES[move]) for move in cube.MOVES], dtype=np.uint8
+)
+
+# ALLOWED[last, move] says whether move may follow last (see cube.SUCCESSORS);
+# the last row, for the root, allows every move
+ALLOWED = np.zeros((len(cube.MOVES) + 1, len(cube.MOVES)), dtype=bool)
+for last, moves in cube.SUCCESSORS.items():
+    ALLOWED[last, moves] = True
+ALLOWED[-1] = True
+
+
+def children(states, lasts, model=cube):
+    """Apply every move to each row of states, a 2-D uint8 array of cube or cubie
+    states (per model), in one gather. Returns the children that follow their
+    parent's last move canonically, one per row, with the row of their parent
+    and their move number. A last move of search.ROOT means any move."""
+    if model is cube:
+        after = states[:, STICKER_MOVES]
+    else:
+        after = CUBIE_MOVES[:, states].transpose(1, 0, 2)
+    parents, moves = np.nonzero(ALLOWED[np.minimum(lasts, len(cube.MOVES))])
+    return after[parents, moves], parents, moves
+
+
+def astar(
+    state,
+    batch=256,
+    verbose=False,
+    heuristic="stickers",
+    metric="qtm",
+    symmetry=False,
+    stats=None,
+    scale=6,
+):
+    """Run A* search on the cube, popping up to batch nodes at a time and
+    expanding them together, and return the solution path, as solver.astar
+    would. The states of a block are one 2-D array: every move is applied with
+    one gather, the heuristic of all children is computed at once, and each
+    child row is cut from the bytes of the result for the closed list. The
+    sticker heuristic is misplaced stickers / scale (6 for rubiks.cost()). If a
+    stats dict is given, the status, nodes expanded, open list length and
+    seconds taken are stored in it."""
+    if symmetry and heuristic not in heuristics.SYMMETRIC:
+        raise ValueError(f"symmetry can't be used with the {heuristic} heuristic")
+    print(f"Running batched A* search ({batch} nodes at a time)...")
+    model, convert, estimate = heuristics.select(heuristic, metric, scale, rows=True)
+    start = convert(state)
+    width = len(model.SOLVED)
+    costs = np.array(cube.METRICS[metric])
+    key = model.canonical if symmetry else bytes
+
+    # Open list items are (node number, g, h, state), as in solver.astar
+    cnt = 0
+    pq = search.BucketOpenList("deep")
+    nodes = search.NodeTable()
+    h = float(estimate(np.frombuffer(start, dtype=np.uint8).reshape(1, width))[0])
+    pq.push((nodes.add(), 0, h, start), h)
+    status = "exhausted"
+    t = time.perf_counter()
+    solution = []
+    visited = set()
+    while pq:
+        # A goal only ends the search when it is the first node of a block, so
+        # nothing open had a lower f; otherwise it goes back for the next block
+        block = []
+        while pq and len(block) < batch:
+            index, g, h, temp_state = item = pq.pop()
+            if temp_state == model.SOLVED:
+                if not block:
+                    solution = solver.path_string(nodes.path(index))
+                    status = "solved"
+                else:
+                    pq.push(item, g + h, g, h)
+                break
+            if key(temp_state) not in visited:
+                visited.add(key(temp_state))
+                block.append(item)
+        if status == "solved":
+            break
+        if not block:
+            continue
+        cnt += len(block)
+        if verbose:
+            print(f"Expanding {len(block)} paths, f = {block[0][1] + block[0][2]:g}")
+
+        states = np.frombuffer(b"".join(item[3] for item in block), dtype=np.uint8)
+        lasts = np.array([nodes.moves[item[0]] for item in block])
+        after, parents, moves = children(states.reshape(-1, width), lasts, model)
+        hs = estimate(after).tolist()
+        gs = (np.array([item[1] for item in block])[parents] + costs[moves]).tolist()
+        data = after.tobytes()
+        for i, (p, move) in enumerate(zip(parents.tolist(), moves.tolist())):
+            child = data[i * width : (i + 1) * width]
+            if key(child) not in visited:
+                g, h = gs[i], hs[i]
+                pq.push((nodes.add(block[p][0], move), g, h, child), g + h, g, h)
+
+    if stats is not None:
+        stats.update(
+            status=status,
+            nodes=cnt,
+            frontier=len(pq),
+            seconds=time.perf_counter() - t,
+        )
+    print(f"searched {cnt} paths")
+    print("solution:", solution)
+    return solution
@@ -0,0 +1,243 @@
+# hda.py
+# Hash-distributed A* (HDA*): one Rubik's cube search spread over several processes.
+
+import multiprocessing
+import queue
+import time
+import zlib
+
+import cube
+import heuristics
+import search
+import solver
+
+# Children bound for another worker are sent in lists of up to this many, and
+# each worker expands up to ROUND nodes between looks at its inbox
+BATCH = 256
+ROUND = 64
+
+SENT, RECEIVED = 0, 1  # indices of the message counters
+JOIN_TIMEOUT = 5  # seconds a finished worker gets to exit before it is terminated
+# Each worker's nodes expanded, open list length and peak resident memory, at
+# progress[3 * rank + NODES] and so on, for the coordinator to check the budget
+NODES, FRONTIER, MEMORY = 0, 1, 2
+
+
+def owner(state, workers):
+    """Return the worker that owns a state. crc32 is the same in every process,
+    unlike hash(), which is salted per interpreter."""
+    return zlib.crc32(state) % workers
+
+
+def _work(
+    rank,
+    inboxes,
+    results,
+    counters,
+    idle,
+    incumbent,
+    stop,
+    progress,
+    heuristic,
+    metric,
+    scale,
+):
+    """Run one worker: take in the nodes sent to it, expand the ones it owns in
+    A* order and send each child to its owner, until stop is set. The node with
+    the lowest h it expanded is reported with its node count at the end."""
+    model, _, estimate = heuristics.select(heuristic, metric, scale)
+    costs = cube.METRICS[metric]
+    workers = len(inboxes)
+    inbox = inboxes[rank]
+    # Open list items are (g, h, state, path), where path holds the move numbers
+    # (indices into cube.MOVES) from the start; best maps each state this
+    # worker owns to the lowest g it has been reached with.
+    pq = search.BucketOpenList("deep")
+    best = {}
+    outgoing = [[] for _ in range(workers)]
+    cnt = 0
+    closest = None  # (h, state, path) of the expanded node with the lowest h
+
+    def receive(g, state, path):
+        if best.get(state, float("inf")) <= g:
+            return
+        best[state] = g
+        h = estimate(state)
+        if g + h < incumbent.value:
+            pq.push((g, h, state, path), g + h, g, h)
+
+    def flush(to):
+        # Count a batch as sent before it can be received (see astar())
+        with counters.get_lock():
+            counters[SENT] += len(outgoing[to])
+        inboxes[to].put(outgoing[to])
+        outgoing[to] = []
+
+    while not stop.is_set():
+        block = not pq
+        while True:
+            try:
+                batch = inbox.get(block, timeout=0.01)
+            except queue.Empty:
+                break
+            idle[rank] = 0  # busy before the batch counts as received
+            with counters.get_lock():
+                counters[RECEIVED] += len(batch)
+            for item in batch:
+                receive(*item)
+            block = False
+
+        for _ in range(ROUND):
+            if not pq:
+                break
+            g, h, state, path = pq.pop()
+            if g + h >= incumbent.value:
+                pq = search.BucketOpenList("deep")  # nothing left can do better
+                break
+            if best[state] < g:
+                continue  # reached more cheaply since this entry was pushed
+            if state == model.SOLVED:
+                with incumbent.get_lock():
+                    if g < incumbent.value:
+                        incumbent.value = g
+                        results.put(("solution", g, path))
+                continue
+            cnt += 1
+            if closest is None or h < closest[0]:
+                closest = (h, state, path)
+            # only canonical move sequences (see cube.SUCCESSORS)
+            for move in cube.successors(path[-1] if path else None):
+                child = model.apply(state, cube.MOVES[move])
+                to = owner(child, workers)
+                item = (g + costs[move], child, path + bytes([move]))
+                if to == rank:
+                    receive(*item)
+                else:
+                    outgoing[to].append(item)
+                    if len(outgoing[to]) >= BATCH:
+                        flush(to)
+
+        for to in range(workers):
+            if outgoing[to]:
+                flush(to)
+        progress[3 * rank + NODES] = cnt
+        progress[3 * rank + FRONTIER] = len(pq)
+        progress[3 * rank + MEMORY] = search.peak_memory()
+        if not pq:
+            idle[rank] = 1  # only after everything generated has been sent
+
+    # A budget can stop the search with batches still queued for other workers,
+    # which nobody will read; don't let them keep this process from exiting
+    for other in inboxes:
+        other.cancel_join_thread()
+    results.put(("nodes", rank, cnt, closest))
+
+
+def astar(
+    state,
+    workers=4,
+    verbose=False,
+    heuristic="stickers",
+    metric="qtm",
+    stats=None,
+    scale=6,
+    budget=None,
+):
+    """Run hash-distributed A* search on the cube with several worker processes and
+    return the solution path, as solver.astar would. Each state is owned by one
+    worker, chosen by hashing it, which keeps its own open and closed lists and
+    sends every child it generates to that child's owner in batches. If a stats
+    dict is given, the status and nodes expanded (in all and per worker) are
+    stored in it. The sticker heuristic is misplaced stickers / scale, as in
+    expand.astar. A search.Budget is checked by this process against the sum of
+    the workers' counts and memory; when it stops the search, the best solution
+    found so far (not necessarily optimal) is returned, or else the path to the
+    state with the lowest h, as solver.astar does."""
+    print(f"Running hash-distributed A* search with {workers} workers...")
+    model, convert, _ = heuristics.select(heuristic, metric, scale)
+    start = convert(state)
+
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    counters = multiprocessing.Array("q", 2)
+    idle = multiprocessing.Array("b", [1] * workers, lock=False)
+    incumbent = multiprocessing.Value("d", float("inf"))
+    stop = multiprocessing.Event()
+    progress = multiprocessing.Array("q", 3 * workers, lock=False)
+    processes = [
+        multiprocessing.Process(
+            target=_work,
+            args=(rank, inboxes, results, counters, idle, incumbent, stop, progress),
+            kwargs={"heuristic": heuristic, "metric": metric, "scale": scale},
+        )
+        for rank in range(workers)
+    ]
+    t = time.perf_counter()
+    for process in processes:
+        process.start()
+    counters[SENT] = 1
+    inboxes[owner(start, workers)].put([(0, start, b"")])
+
+    # The search is over once every worker is idle and every node sent has been
+    # received. A worker marks itself busy before counting a batch as received
+    # and idle only after counting what it sent, so if the counters are equal
+    # and unchanged on both sides of seeing every worker idle, no node was in
+    # flight or being expanded in between.
+    status = "exhausted"
+    while True:
+        time.sleep(0.005)
+        if budget:
+            memory = search.peak_memory() + sum(progress[MEMORY::3])
+            limit = budget.exceeded(
+                sum(progress[NODES::3]), sum(progress[FRONTIER::3]), memory
+            )
+            if limit:
+                status = limit
+                break
+        with counters.get_lock():
+            before = counters[:]
+        if not all(idle):
+            continue
+        with counters.get_lock():
+            after = counters[:]
+        if before == after and before[SENT] == before[RECEIVED]:
+            break
+    stop.set()
+
+    solution, cost, nodes = [], float("inf"), [0] * workers
+    closest = None
+    finished = 0
+    while finished < workers:
+        message = results.get()
+        if message[0] == "solution" and message[1] < cost:
+            cost, solution = message[1], list(message[2])
+        elif message[0] == "nodes":
+            nodes[message[1]] = message[2]
+            if message[3] and (closest is None or message[3][0] < closest[0]):
+                closest = message[3]
+            finished += 1
+    for inbox in inboxes:
+        inbox.cancel_join_thread()
+    for process in processes:
+        process.join(JOIN_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    if cost < float("inf"):
+        status = "solved" if status == "exhausted" else status
+    elif closest is not None and status != "exhausted":
+        solution = list(closest[2])  # the path to the closest state reached
+    solution = solver.path_string(solution)
+    if verbose:
+        seconds = time.perf_counter() - t
+        print(f"{sum(nodes)} nodes in {seconds:.2f} s, {nodes} per worker")
+    if stats is not None:
+        stats.update(status=status, nodes=sum(nodes), workers=nodes)
+        if cost == float("inf") and closest is not None:
+            h, state, path = closest
+            stickers = state if model is cube else model.to_stickers(state)
+            stats.update(best_h=h, best_path=solution, best_state=cube.unpack(stickers))
+    print(f"searched {sum(nodes)} paths")
+    print("solution:", solution)
+    return solution
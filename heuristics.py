@@ -0,0 +1,42 @@
+# heuristics.py
+# The cube heuristics the searches choose from, and the state model each one needs.
+
+import numpy as np
+
+import cube
+import cubie
+import pattern_db
+
+# The stickers rubiks.cost() compares with their face's center: the first eight
+# of each face
+MISPLACED = cube.MisplacedCounter(j for j in range(54) if j % 9 != 8)
+
+# The heuristics that give every state of a symmetry class the same h, so the
+# searches may key their closed lists by cube.canonical(). MISPLACED skips the
+# last sticker of each face and the edge tables each follow a fixed half of the
+# edges, and a symmetry moves those onto other stickers and edges.
+SYMMETRIC = ("corners",)
+
+
+def select(heuristic="stickers", metric="qtm", scale=6, rows=False):
+    """Return the model (cube or cubie) a search with a heuristic runs on, the
+    function turning a sticker list into its normalized start state, and h.
+    "stickers" is misplaced stickers / scale, as rubiks.cost() computes it (the
+    bonus version divides by 12); anything else is a pattern database from
+    pattern_db.py. With rows, h takes a 2-D array of states (see expand.py)."""
+    if heuristic == "stickers":
+        if rows:
+            stickers = MISPLACED.stickers
+            home = np.frombuffer(cube.SOLVED, dtype=np.uint8)[stickers]
+            estimate = lambda states: (states[:, stickers] != home).sum(axis=1) / scale
+        else:
+            estimate = lambda state: MISPLACED.count(state) / scale
+        return cube, cube.normalize, estimate
+    # Pattern databases are indexed by cubies, so search cubie states (20 bytes,
+    # one bytes.translate() per move) instead of stickers
+    if rows:
+        estimate = pattern_db.heuristic_rows(heuristic, metric)
+    else:
+        estimate = pattern_db.heuristic(heuristic, metric)
+    convert = lambda stickers: cubie.from_stickers(cube.normalize(stickers))
+    return cubie, convert, estimate
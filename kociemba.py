@@ -0,0 +1,258 @@
+# kociemba.py
+# Kociemba's two-phase algorithm: fast, short (but not optimal) Rubik's cube solutions.
+
+from itertools import combinations, permutations
+import os
+import time
+
+import numpy as np
+
+import cube
+import cubie
+import pattern_db
+
+# The 18 face turns, three per face in the order of cube.FACES, so move m turns
+# face m // 3 and faces 2a and 2a + 1 share an axis
+MOVES = [m for face in cube.FACES for m in (face.lower(), face, face + "2")]
+
+# Each move in astar's notation, which has no half turns, so "U2" becomes "uu"
+_QUARTER_TURNS = [move[0].lower() * 2 if move[1:] == "2" else move for move in MOVES]
+
+# Phase 2 keeps the cube in the subgroup G1 = <U, D, L2, R2, B2, F2>
+PHASE2_MOVES = [
+    m for m, move in enumerate(MOVES) if move[0] in "UuDd" or move[1:] == "2"
+]
+
+# Coordinate sizes. Phase 1 brings corner twist, edge flip and the set of
+# middle-layer ("UD-slice") edge positions to zero; phase 2 then solves the
+# corner permutation, the permutation of the eight U/D edges and the
+# permutation of the four slice edges using only G1 moves.
+N_TWIST = 2187  # 3^7
+N_FLIP = 2048  # 2^11
+N_SLICE = 495  # 12 choose 4
+N_CORNERS = 40320  # 8!
+N_UD_EDGES = 40320  # 8!
+N_SLICE_EDGES = 24  # 4!
+
+# Longest phase 2 tried for each phase 1 solution. Most cubes need at most 12
+# G1 moves in phase 2, and moving on to the next phase 1 solution is much
+# cheaper than searching deeper.
+PHASE2_DEPTH = 12
+
+TABLE_FILE = os.path.join(pattern_db.TABLES, "kociemba.npz")
+
+# Slice coordinate of each set of four positions holding the slice edges, as a
+# 12-bit mask; the solved set {8, 9, 10, 11} is 0
+_SLICE_SETS = list(combinations(range(11, -1, -1), 4))
+_SLICE_INDEX = [-1] * 4096
+for _i, _positions in enumerate(_SLICE_SETS):
+    _SLICE_INDEX[sum(1 << p for p in _positions)] = _i
+
+# For each move: the position each corner/edge comes from and its change in
+# twist/flip, as four lists (corner src, twist, edge src, flip)
+CUBIE_MOVES = [cubie.CORNER_MOVES[move] + cubie.EDGE_MOVES[move] for move in MOVES]
+
+
+def _phase1_coords(state):
+    """Return the (twist, flip, slice) coordinates of a cubie state."""
+    co = cubie.corners(state)[1]
+    ep, eo = cubie.edges(state)
+    twist = 0
+    for t in co[:7]:
+        twist = twist * 3 + t
+    flip = 0
+    for f in eo[:11]:
+        flip = flip * 2 + f
+    return twist, flip, _SLICE_INDEX[sum(1 << p for p, e in enumerate(ep) if e >= 8)]
+
+
+def _phase2_coords(state):
+    """Return the (corners, U/D edges, slice edges) coordinates of a cubie state in G1."""
+    cp = cubie.corners(state)[0]
+    ep = cubie.edges(state)[0]
+    slice_edges = [e - 8 for e in ep[8:]]
+    return (
+        pattern_db.rank(cp, 8),
+        pattern_db.rank(ep[:8], 8),
+        pattern_db.rank(slice_edges, 4),
+    )
+
+
+def _digits(n, base, width):
+    """Return an (n, width) array of the base-`base` digits of 0..n-1, most significant first."""
+    digits = np.zeros((n, width), dtype=np.int8)
+    x = np.arange(n)
+    for k in range(width - 1, -1, -1):
+        digits[:, k] = x % base
+        x //= base
+    return digits
+
+
+def build_tables(filename=TABLE_FILE, verbose=True):
+    """Compute the move and pruning tables with numpy and save them to a .npz file."""
+    moves = CUBIE_MOVES
+    twists = _digits(N_TWIST, 3, 7)
+    twists = np.hstack([twists, (-twists.sum(axis=1) % 3)[:, None]])
+    flips = _digits(N_FLIP, 2, 11)
+    flips = np.hstack([flips, (flips.sum(axis=1) % 2)[:, None]])
+    slices = np.zeros((N_SLICE, 12), dtype=np.int64)
+    for i, positions in enumerate(_SLICE_SETS):
+        slices[i, list(positions)] = 1
+    slice_index = np.array(_SLICE_INDEX)
+    perms8 = np.array(list(permutations(range(8))), dtype=np.int8)
+    perms4 = np.array(list(permutations(range(4))), dtype=np.int8)
+
+    t = {}
+    t["twist"] = np.empty((N_TWIST, 18), dtype=np.int32)
+    t["flip"] = np.empty((N_FLIP, 18), dtype=np.int32)
+    t["slice"] = np.empty((N_SLICE, 18), dtype=np.int32)
+    for m, (csrc, twist, esrc, flip) in enumerate(moves):
+        csrc, esrc = list(csrc), list(esrc)
+        new = (twists[:, csrc] + np.array(twist, dtype=np.int8)) % 3
+        t["twist"][:, m] = new[:, :7] @ (3 ** np.arange(6, -1, -1))
+        new = flips[:, esrc] ^ np.array(flip, dtype=np.int8)
+        t["flip"][:, m] = new[:, :11] @ (2 ** np.arange(10, -1, -1))
+        t["slice"][:, m] = slice_index[slices[:, esrc] @ (1 << np.arange(12))]
+
+    t["corners"] = np.empty((N_CORNERS, len(PHASE2_MOVES)), dtype=np.int32)
+    t["ud_edges"] = np.empty((N_UD_EDGES, len(PHASE2_MOVES)), dtype=np.int32)
+    t["slice_edges"] = np.empty((N_SLICE_EDGES, len(PHASE2_MOVES)), dtype=np.int32)
+    for j, m in enumerate(PHASE2_MOVES):
+        csrc, _, esrc, _ = moves[m]
+        t["corners"][:, j] = pattern_db.rank_rows(perms8[:, list(csrc)], 8)
+        t["ud_edges"][:, j] = pattern_db.rank_rows(perms8[:, list(esrc[:8])], 8)
+        slice_src = [e - 8 for e in esrc[8:]]
+        t["slice_edges"][:, j] = pattern_db.rank_rows(perms4[:, slice_src], 4)
+
+    def pruning(a, b, n_b):
+        """Distance table over pairs of coordinates, by BFS from the solved pair (0, 0)."""
+        table_a, table_b = t[a], t[b]
+
+        def neighbors(indices):
+            i, j = np.divmod(indices, n_b)
+            return table_a[i].astype(np.int64) * n_b + table_b[j]
+
+        return pattern_db.bfs(len(table_a) * n_b, 0, neighbors, verbose=verbose)
+
+    t["twist_slice"] = pruning("twist", "slice", N_SLICE)
+    t["flip_slice"] = pruning("flip", "slice", N_SLICE)
+    t["corners_slice_edges"] = pruning("corners", "slice_edges", N_SLICE_EDGES)
+    t["ud_slice_edges"] = pruning("ud_edges", "slice_edges", N_SLICE_EDGES)
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    np.savez(filename, **t)
+    return filename
+
+
+_tables = None
+
+
+def load_tables(filename=TABLE_FILE):
+    """Load the tables (building and caching them on disk the first time) as flat
+    Python lists and bytes, which index much faster than numpy arrays."""
+    global _tables
+    if _tables is None:
+        if not os.path.exists(filename):
+            print(f"Building two-phase tables in {filename}...")
+            build_tables(filename, verbose=False)
+        with np.load(filename) as data:
+            _tables = {
+                name: (a.tobytes() if a.dtype == np.uint8 else a.ravel().tolist())
+                for name, a in data.items()
+            }
+    return _tables
+
+
+def solve(state, max_length=30, verbose=False, stats=None):
+    """Solve the cube with the two-phase algorithm and return the path in the
+    notation used by astar, with half turns written as two quarter turns (e.g.
+    "uu"). The first solution of at most max_length face turns is returned. If a
+    stats dict is given, the number of nodes expanded is stored in it."""
+    print("Running two-phase search...")
+    t = load_tables()
+    twist_move, flip_move, slice_move = t["twist"], t["flip"], t["slice"]
+    corners_move, ud_move, slice_edges_move = (
+        t["corners"],
+        t["ud_edges"],
+        t["slice_edges"],
+    )
+    twist_slice, flip_slice = t["twist_slice"], t["flip_slice"]
+    corners_slice_edges, ud_slice_edges = t["corners_slice_edges"], t["ud_slice_edges"]
+    n2 = len(PHASE2_MOVES)
+
+    start = cubie.from_stickers(cube.normalize(state))
+    path = []  # move numbers (indices into MOVES)
+    cnt = 0
+
+    def allowed(m):
+        """Skip turning the same face twice in a row, and order commuting opposite faces."""
+        if not path:
+            return True
+        last = path[-1] // 3
+        return m // 3 != last and not (m // 6 == last // 2 and m // 3 < last)
+
+    def phase2(corners, ud, slice_edges, depth):
+        nonlocal cnt
+        cnt += 1
+        if depth == 0:
+            return corners == ud == slice_edges == 0
+        for j, m in enumerate(PHASE2_MOVES):
+            if not allowed(m):
+                continue
+            c = corners_move[corners * n2 + j]
+            u = ud_move[ud * n2 + j]
+            s = slice_edges_move[slice_edges * n2 + j]
+            if max(corners_slice_edges[c * 24 + s], ud_slice_edges[u * 24 + s]) < depth:
+                path.append(m)
+                if phase2(c, u, s, depth - 1):
+                    return True
+                path.pop()
+        return False
+
+    def phase1(twist, flip, slice_, depth):
+        nonlocal cnt
+        cnt += 1
+        if depth == 0:
+            # A phase 1 solution ending in a G1 move would have been found one
+            # level shallower, so only try phase 2 after other moves
+            if twist or flip or slice_ or (path and path[-1] in PHASE2_MOVES):
+                return False
+            cubies = start
+            for m in path:
+                cubies = cubie.apply(cubies, MOVES[m])
+            coords = _phase2_coords(cubies)
+            for depth2 in range(min(max_length - len(path), PHASE2_DEPTH) + 1):
+                if phase2(*coords, depth2):
+                    return True
+            return False
+        for m in range(18):
+            if not allowed(m):
+                continue
+            tw = twist_move[twist * 18 + m]
+            fl = flip_move[flip * 18 + m]
+            sl = slice_move[slice_ * 18 + m]
+            if (
+                max(twist_slice[tw * N_SLICE + sl], flip_slice[fl * N_SLICE + sl])
+                < depth
+            ):
+                path.append(m)
+                if phase1(tw, fl, sl, depth - 1):
+                    return True
+                path.pop()
+        return False
+
+    t0 = time.perf_counter()
+    coords = _phase1_coords(start)
+    if coords == (0, 0, 0):  # already in G1, so phase 1 is empty
+        found = any(phase2(*_phase2_coords(start), d) for d in range(max_length + 1))
+    else:
+        found = any(phase1(*coords, depth1) for depth1 in range(1, max_length + 1))
+    if verbose:
+        print(f"{len(path)} face turns in {time.perf_counter() - t0:.3f} s")
+
+    solution = "".join(_QUARTER_TURNS[m] for m in path) if found else ""
+    if stats is not None:
+        stats["nodes"] = cnt
+    print(f"searched {cnt} paths")
+    print("solution:", solution)
+    return solution
@@ -2,13 +2,18 @@
 # Flipping pancakes with greedy best-first search (GBFS).
 
 import argparse
-from graphics import *
-from matplotlib import cm, colors
+from array import array
 import pdb
-from queue import PriorityQueue
 import random
+import search
 import time
 
+if __name__ == "__main__":
+    # graphics opens Tk when imported, so only load it for the GUI and keep
+    # gbfs importable without a display (see batch.py)
+    from graphics import *
+    from matplotlib import cm, colors
+
 parser = argparse.ArgumentParser(
     description="Use greedy best-first search (GBFS) to optimally flip a stack of pancakes"
 )
@@ -126,43 +131,93 @@ def cost(stack):
     return h
 
 
-def gbfs(gui, stack):
-    """Run greedy best-first search on a stack of pancakes and return the solution path."""
+def gbfs(
+    gui,
+    stack,
+    open_list="bucket",
+    tiebreak="fifo",
+    verbose=True,
+    stats=None,
+    zobrist=False,
+):
+    """Run greedy best-first search on a stack of pancakes and return the solution path.
+    The open list ("heap" or "bucket") and tie-breaking rule come from search.py.
+    The gui may be None to search without one. With zobrist, the closed and open
+    sets are keyed by 64-bit Zobrist hashes, updated from the flipped pancakes
+    alone (see search.Zobrist). If a stats dict is given, the number of nodes
+    expanded is stored in it."""
     print("Running greedy best-first search...")
 
-    # Get graphics objects from GUI
-    obj = gui.items
-    pancakes = obj[:-2]
-    status = obj[-1]
+    if gui is not None:
+        # Get graphics objects from GUI
+        obj = gui.items
+        pancakes = obj[:-2]
+        status = obj[-1]
 
-    # Update status text on GUI
-    status.setText(f"Running greedy best-first search...")
-    time.sleep(0.5)
+        # Update status text on GUI
+        status.setText(f"Running greedy best-first search...")
+        time.sleep(0.5)
 
     # ***MODIFY CODE HERE*** (20-25 lines)
+    # Open list items are (node number, stack, depth), ordered by cost. The node
+    # table keeps just the parent number and flip of each node, so the path is
+    # only built once, at the goal. Stacks are stored as tuples so they can be
+    # hashed.
     cnt = 0
-    pq = PriorityQueue()
-    pq.put((cost(stack), ""))
+    pq = search.OPEN_LISTS[open_list](tiebreak)
+    nodes = search.NodeTable()
+    pq.push((nodes.add(), tuple(stack), 0), cost(stack))
     solution = []
-    visited = []
-    while not pq.empty():
-        node = pq.get()
-        temp_stack = simulate(stack, node[1])
-        visited.append(temp_stack)
-        print(f"Looking at path {node[1]}")
+    if zobrist:
+        zob = search.Zobrist(len(stack), len(stack))
+        hashes = array("Q", [zob.hash(stack)])  # by node number, as in nodes
+        visited = search.ZobristSet()
+        queued = search.ZobristSet()
+        queued.add(hashes[0], tuple(stack))
+    else:
+        visited = set()  # closed list: stacks already expanded
+        queued = {tuple(stack)}  # stacks currently waiting on the open list
+    while pq:
+        index, key, depth = pq.pop()
+        if zobrist:
+            queued.discard(hashes[index], key)
+            visited.add(hashes[index], key)
+        else:
+            queued.discard(key)
+            visited.add(key)
+        temp_stack = list(key)
+        if verbose:
+            print(f"Looking at stack {temp_stack}")
         cnt += 1
         if cost(temp_stack) == 0:
-            solution = node[1]
+            solution = nodes.path(index)
             break
-        for i in range(2, len(pancakes) + 1):
-            if (node[1] == "" or node[1][-1] != str(i)) and (
-                simulate(temp_stack, str(i)) not in visited
-            ):
-                pq.put((cost(simulate(temp_stack, str(i))), node[1] + str(i)))
-
+        for i in range(2, len(stack) + 1):
+            if nodes.moves[index] == i:
+                continue  # flipping the same pancakes twice undoes the last move
+            child = tuple(simulate(temp_stack, [i]))
+            if zobrist:
+                # flipping i pancakes reverses the top i positions
+                z = zob.update(hashes[index], key, range(i), range(i - 1, -1, -1))
+                if visited.contains(z, child) or queued.contains(z, child):
+                    continue
+                queued.add(z, child)
+                hashes.append(z)
+            elif child not in visited and child not in queued:
+                queued.add(child)
+            else:
+                continue
+            h = cost(child)
+            pq.push((nodes.add(index, i), child, depth + 1), h, depth + 1, h)
+
+    if stats is not None:
+        stats["nodes"] = cnt
     print(f"searched {cnt} paths")
     print("solution:", solution)
-    status.setText("...search is complete")
+    if gui is not None:
+        status.setText("...search is complete")
+
+    return solution
 
 
 def simulate(stack, path):
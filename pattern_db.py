@@ -0,0 +1,297 @@
+# pattern_db.py
+# Pattern databases: admissible Rubik's cube heuristics precomputed by breadth-first search.
+
+import argparse
+from itertools import permutations
+import mmap
+from operator import getitem
+import os
+import time
+
+import numpy as np
+
+import cube
+import cubie
+
+parser = argparse.ArgumentParser(
+    description="Build pattern databases for the Rubik's cube A* search"
+)
+parser.add_argument(
+    "table", choices=["corners", "edges"], help="which pattern database(s) to build"
+)
+parser.add_argument(
+    "-m",
+    "--metric",
+    choices=["qtm", "htm"],
+    help="moves the distances count (qtm: quarter turns, htm: quarter and half turns)",
+    default="qtm",
+)
+
+# Pattern database files live here unless a filename is given
+TABLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables")
+
+# The moves each metric allows, as one BFS step each; a table is only
+# admissible for searches using the same metric (see cube.METRICS)
+METRICS = {"qtm": list(cube.QUARTER_TURNS), "htm": cube.MOVES}
+
+UNSEEN = 15  # nibble value of an entry the BFS has not reached yet
+
+# Corner states are numbered perm * 3^7 + twist, where perm is the
+# lexicographic rank of which corner sits in each position and twist encodes
+# the orientations of the first 7 corners in base 3 (the 8th is implied).
+CORNER_PERMS = 40320  # 8!
+CORNER_TWISTS = 2187  # 3^7
+CORNER_STATES = CORNER_PERMS * CORNER_TWISTS
+
+# Edge states track six of the twelve edges and are numbered perm * 2^6 + flips,
+# where perm is the lexicographic rank of the positions of those edges and
+# flips has one bit per tracked edge. The two groups cover all twelve edges.
+EDGE_PERMS = 665280  # 12! / 6!
+EDGE_FLIPS = 64  # 2^6
+EDGE_STATES = EDGE_PERMS * EDGE_FLIPS
+EDGE_GROUPS = ((0, 1, 2, 3, 4, 5), (6, 7, 8, 9, 10, 11))
+
+
+def corner_index(state):
+    """Return the corner pattern number of a cubie state (see cubie.py)."""
+    perm = [0] * 8
+    twist = [0] * 8
+    for k in range(8):
+        p, t = divmod(state[k], 3)
+        perm[p] = k
+        twist[p] = t
+    index = 0
+    for t in twist[:7]:
+        index = index * 3 + t
+    return rank(perm, 8) * CORNER_TWISTS + index
+
+
+def edge_indices(state):
+    """Return the edge pattern number of each edge group for a cubie state."""
+    indices = []
+    for group in EDGE_GROUPS:
+        position, flips = [], 0
+        for i, k in enumerate(group):
+            p, f = divmod(state[8 + k] - 24, 2)
+            position.append(p)
+            flips |= f << i
+        indices.append(rank(position, 12) * EDGE_FLIPS + flips)
+    return indices
+
+
+def rank(perm, n):
+    """Return the lexicographic rank of perm among all sequences of len(perm)
+    distinct values from range(n)."""
+    index = 0
+    for i, p in enumerate(perm):
+        index = index * (n - i) + p - sum(q < p for q in perm[:i])
+    return index
+
+
+def _corner_tables(moves):
+    """Return numpy move tables for the permutation and twist coordinates of the corners."""
+    perms = np.array(list(permutations(range(8))), dtype=np.int8)  # row r has rank r
+    twists = np.zeros((CORNER_TWISTS, 8), dtype=np.int8)
+    t = np.arange(CORNER_TWISTS)
+    for k in range(6, -1, -1):
+        twists[:, k] = t % 3
+        t //= 3
+    twists[:, 7] = -twists[:, :7].sum(axis=1) % 3
+
+    perm_table = np.empty((CORNER_PERMS, len(moves)), dtype=np.int32)
+    twist_table = np.empty((CORNER_TWISTS, len(moves)), dtype=np.int32)
+    for m, move in enumerate(moves):
+        src, twist = cubie.CORNER_MOVES[move]
+        perm_table[:, m] = rank_rows(perms[:, src], 8)
+        new = (twists[:, src] + np.array(twist, dtype=np.int8)) % 3
+        twist_table[:, m] = new[:, :7] @ (3 ** np.arange(6, -1, -1))
+    return perm_table, twist_table
+
+
+def _edge_tables(moves):
+    """Return numpy move tables for the positions and flips of a group of six edges."""
+    positions = np.array(list(permutations(range(12), 6)), dtype=np.int8)
+    perm_table = np.empty((EDGE_PERMS, len(moves)), dtype=np.int32)
+    flip_table = np.empty((EDGE_PERMS, len(moves)), dtype=np.uint8)
+    for m, move in enumerate(moves):
+        src, flip = (np.array(a, dtype=np.int8) for a in cubie.EDGE_MOVES[move])
+        dest = np.argsort(src).astype(np.int8)  # where each position sends its edge
+        new = dest[positions]
+        perm_table[:, m] = rank_rows(new, 12)
+        flip_table[:, m] = (flip[new] << np.arange(6, dtype=np.uint8)).sum(axis=1)
+    return perm_table, flip_table
+
+
+def rank_rows(perms, n):
+    """Vectorized rank() for each row of a 2-D array."""
+    index = np.zeros(len(perms), dtype=np.int64)
+    for i in range(perms.shape[1]):
+        smaller = (perms[:, :i] < perms[:, i : i + 1]).sum(axis=1)
+        index = index * (n - i) + perms[:, i] - smaller
+    return index
+
+
+def corner_index_rows(states):
+    """Vectorized corner_index() for each row of a 2-D array of cubie states."""
+    p, t = np.divmod(states[:, :8].astype(np.int64), 3)
+    perm = np.argsort(p, axis=1)  # perm[p] = k, as in corner_index()
+    twist = np.take_along_axis(t, perm, axis=1)
+    weights = 3 ** np.arange(6, -1, -1)  # the first seven twists, base 3
+    return rank_rows(perm, 8) * CORNER_TWISTS + twist[:, :7] @ weights
+
+
+def edge_indices_rows(states):
+    """Vectorized edge_indices() for each row of a 2-D array of cubie states."""
+    p, f = np.divmod(states[:, 8:].astype(np.int64) - 24, 2)
+    bits = np.arange(6)
+    return [
+        rank_rows(p[:, group], 12) * EDGE_FLIPS + (f[:, group] << bits).sum(axis=1)
+        for group in EDGE_GROUPS
+    ]
+
+
+def bfs(size, start, neighbors, chunk=1 << 21, verbose=True):
+    """Breadth-first search over states numbered 0..size-1 from the start number.
+    neighbors(indices) returns the array of state numbers one move away from each
+    index, one column per move. Returns an array of distances, where 15 means 15
+    or more, which is still a valid lower bound."""
+    dist = np.full(size, UNSEEN, dtype=np.uint8)
+    dist[start] = 0
+    depth = 0
+    t = time.perf_counter()
+    while True:
+        frontier = np.flatnonzero(dist == depth)
+        if len(frontier) == 0 or depth + 1 == UNSEEN:
+            break
+        if verbose:
+            print(
+                f"depth {depth}: {len(frontier):,} states ({time.perf_counter() - t:.0f} s)"
+            )
+        for i in range(0, len(frontier), chunk):
+            children = neighbors(frontier[i : i + chunk]).ravel()
+            children = children[dist[children] == UNSEEN]
+            dist[children] = depth + 1
+        depth += 1
+    return dist
+
+
+def save(dist, filename):
+    """Pack a distance array two entries per byte and write it to a file."""
+    if len(dist) % 2:
+        dist = np.append(dist, UNSEEN)
+    packed = dist[0::2] | (dist[1::2] << 4)
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    packed.tofile(filename)
+
+
+def build_corners(metric="qtm", filename=None, verbose=True):
+    """Build the corner pattern database (8! * 3^7 entries) and save it."""
+    moves = METRICS[metric]
+    perm_table, twist_table = _corner_tables(moves)
+
+    def neighbors(indices):
+        perm, twist = np.divmod(indices, CORNER_TWISTS)
+        return perm_table[perm].astype(np.int64) * CORNER_TWISTS + twist_table[twist]
+
+    dist = bfs(CORNER_STATES, 0, neighbors, verbose=verbose)
+    filename = filename or table_path("corners", metric)
+    save(dist, filename)
+    return filename
+
+
+def build_edges(metric="qtm", verbose=True):
+    """Build one pattern database (12!/6! * 2^6 entries) per edge group and save them."""
+    moves = METRICS[metric]
+    perm_table, flip_table = _edge_tables(moves)
+
+    def neighbors(indices):
+        perm, flips = np.divmod(indices, EDGE_FLIPS)
+        flips = flips[:, None] ^ flip_table[perm]
+        return perm_table[perm].astype(np.int64) * EDGE_FLIPS + flips
+
+    filenames = []
+    for g, group in enumerate(EDGE_GROUPS):
+        start = rank(group, 12) * EDGE_FLIPS
+        dist = bfs(EDGE_STATES, start, neighbors, verbose=verbose)
+        filenames.append(table_path(f"edges{g}", metric))
+        save(dist, filenames[-1])
+    return filenames
+
+
+def table_path(name, metric="qtm"):
+    """Return the default filename of a pattern database."""
+    return os.path.join(TABLES, f"{name}-{metric}.pdb")
+
+
+class PatternDatabase:
+    """A nibble-packed table of distances, memory-mapped read-only from a file
+    written by save(), so it is shared between processes and loads instantly."""
+
+    def __init__(self, filename):
+        if not os.path.exists(filename):
+            raise FileNotFoundError(
+                f"{filename} not found; build it with: python pattern_db.py"
+            )
+        with open(filename, "rb") as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, index):
+        byte = self._mm[index >> 1]
+        return byte >> 4 if index & 1 else byte & 15
+
+    def lookup(self, indices):
+        """Vectorized self[index] for an array of indices."""
+        byte = np.frombuffer(self._mm, dtype=np.uint8)[indices >> 1]
+        return np.where(indices & 1, byte >> 4, byte & 15)
+
+
+def heuristic(name, metric="qtm"):
+    """Return an admissible heuristic function h(state) for cubie states:
+    "corners", "edges" (the larger of the two edge tables) or "max" (the largest
+    of all three). The max of admissible heuristics is admissible."""
+    if name in ("corners", "max"):
+        corners = PatternDatabase(table_path("corners", metric))
+    if name in ("edges", "max"):
+        edges = [PatternDatabase(table_path(f"edges{g}", metric)) for g in range(2)]
+
+    if name == "corners":
+        return lambda state: corners[corner_index(state)]
+    elif name == "edges":
+        return lambda state: max(map(getitem, edges, edge_indices(state)))
+    elif name == "max":
+        return lambda state: max(
+            corners[corner_index(state)], *map(getitem, edges, edge_indices(state))
+        )
+    raise ValueError(f"unknown heuristic {name!r}")
+
+
+def heuristic_rows(name, metric="qtm"):
+    """Vectorized heuristic(name, metric): the function returned takes a 2-D array
+    of cubie states and returns the array of their estimates."""
+    tables = []
+    if name in ("corners", "max"):
+        corners = PatternDatabase(table_path("corners", metric))
+        tables.append(lambda states: corners.lookup(corner_index_rows(states)))
+    if name in ("edges", "max"):
+        edges = [PatternDatabase(table_path(f"edges{g}", metric)) for g in range(2)]
+        tables.append(
+            lambda states: np.maximum(
+                *map(PatternDatabase.lookup, edges, edge_indices_rows(states))
+            )
+        )
+    if not tables:
+        raise ValueError(f"unknown heuristic {name!r}")
+    return lambda states: np.max([table(states) for table in tables], axis=0)
+
+
+def main(args):
+    t = time.perf_counter()
+    if args.table == "corners":
+        filenames = [build_corners(args.metric)]
+    elif args.table == "edges":
+        filenames = build_edges(args.metric)
+    print(f"wrote {', '.join(filenames)} in {time.perf_counter() - t:.0f} s")
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
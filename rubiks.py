@@ -2,9 +2,16 @@
 # Solve a 3x3 Rubik's cube using A* search.
 
 import argparse
-from graphics import *
+import cube
+from functools import partial
+import kociemba
 import pdb
-from queue import PriorityQueue
+import solver
+
+if __name__ == "__main__":
+    # graphics opens Tk when imported, so only load it for the GUI and keep
+    # the searches importable without a display (see batch.py)
+    from graphics import *
 
 parser = argparse.ArgumentParser(description="Solving a Rubik's Cube with A* Search")
 parser.add_argument(
@@ -12,6 +19,104 @@ parser.add_argument(
     "--state",
     help="text file containing initial state of the cube, encoded as a sequence of integers",
 )
+parser.add_argument(
+    "--heuristic",
+    choices=["stickers", "corners", "edges", "max"],
+    help="heuristic for A* search (pattern databases are built by pattern_db.py)",
+    default="stickers",
+)
+parser.add_argument(
+    "--metric",
+    choices=list(cube.METRICS),
+    help="qtm counts a half turn as two moves, htm as one (pattern databases must match)",
+    default="qtm",
+)
+parser.add_argument(
+    "--search",
+    choices=["astar", "idastar", "bidirectional", "kociemba"],
+    help="search run by the 'a' key: A*, IDA* (less memory), bidirectional A* "
+    "or two-phase (fast, not optimal)",
+    default="astar",
+)
+parser.add_argument(
+    "--symmetry",
+    action="store_true",
+    help="share one A* closed-list entry among states equal up to turning or "
+    "mirroring the whole cube (corners heuristic only)",
+)
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    help="number of processes A* search is spread over (see hda.py)",
+    default=1,
+)
+parser.add_argument(
+    "--batch",
+    type=int,
+    help="expand this many A* nodes at a time with numpy (see expand.py)",
+    default=0,
+)
+parser.add_argument(
+    "--max-nodes", type=int, help="stop A* search after expanding this many nodes"
+)
+parser.add_argument(
+    "--time-limit", type=float, help="stop A* search after this many seconds"
+)
+parser.add_argument(
+    "--max-frontier", type=int, help="stop A* search once this many nodes are open"
+)
+parser.add_argument(
+    "--max-memory",
+    type=float,
+    help="stop A* search once the process has used this many MB of memory",
+)
+parser.add_argument(
+    "--bloom",
+    type=int,
+    metavar="STATES",
+    help="keep A* search's closed list in a Bloom filter sized for this many states "
+    "(less memory, but solutions may not be optimal)",
+)
+parser.add_argument(
+    "--bloom-error",
+    type=float,
+    help="false-positive rate of the Bloom filter",
+    default=0.001,
+)
+parser.add_argument(
+    "--spill",
+    type=int,
+    metavar="ENTRIES",
+    help="keep at most this many A* open list entries in memory and the rest on disk",
+)
+parser.add_argument(
+    "--spill-dir",
+    help="directory for the open list files (default: the temp directory)",
+)
+parser.add_argument(
+    "--checkpoint",
+    metavar="FILE",
+    help="save the A* search to this file every --checkpoint-every seconds",
+)
+parser.add_argument(
+    "--checkpoint-every",
+    type=float,
+    metavar="SECONDS",
+    help="seconds between checkpoints",
+    default=300,
+)
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="go on with the A* search saved in the --checkpoint file",
+)
+parser.add_argument(
+    "--endgame",
+    type=int,
+    help="end A* search at states within this many moves of solved (table built by endgame.py)",
+    default=0,
+)
 
 
 def main(args):
@@ -90,8 +195,37 @@ def main(args):
                 recolor(gui, current_state, params)
 
             elif key == "a":
-                # Solve the cube using A* search
-                path = astar(current_state)
+                # Solve the cube using A* search (or another search chosen with --search)
+                if args.search == "kociemba":
+                    path = kociemba.solve(current_state)
+                else:
+                    search_fn = {
+                        "astar": partial(
+                            astar,
+                            symmetry=args.symmetry,
+                            endgame_depth=args.endgame,
+                            workers=args.workers,
+                            budget=solver.budget(args),
+                            batch=args.batch,
+                            closed=solver.bloom(args),
+                            spill=args.spill,
+                            spill_dir=args.spill_dir,
+                            checkpoint_file=args.checkpoint,
+                            checkpoint_every=args.checkpoint_every,
+                            resume=args.resume,
+                        ),
+                        "idastar": idastar,
+                        "bidirectional": bidirectional,
+                    }[args.search]
+                    path = search_fn(
+                        current_state, heuristic=args.heuristic, metric=args.metric
+                    )
+
+            elif key == "i":
+                # Solve the cube using iterative-deepening A* search
+                path = idastar(
+                    current_state, heuristic=args.heuristic, metric=args.metric
+                )
 
             elif key == "h":
                 # Print the current heuristic cost
@@ -100,35 +234,30 @@ def main(args):
     gui.close()
 
 
-def astar(state, verbose=False):
-    """Run A* search on the cube based on its current state and return the solution path."""
-    print("Running A* search...")
-    # ***ENTER CODE HERE*** (20-25 lines)
-    cnt = 0
-    pq = PriorityQueue()
-    pq.put((cost("", state), ""))
-    solution = []
-    visited = []
-    while not pq.empty():
-        node = pq.get()
-        temp_state = simulate(state, node[1])
-        visited.append(temp_state)
-        if verbose:
-            print(f"Looking at path {node[1]}")
-        cnt += 1
-        if cost("", temp_state) > 0:
-            for i in "UuDdLlRrBbFf":
-                if (node[1] == "" or node[1][-1] != i.swapcase()) and (
-                    simulate(temp_state, i) not in visited
-                ):
-                    pq.put((cost(node[1] + i, simulate(temp_state, i)), node[1] + i))
-        else:
-            solution = node[1]
-            break
-
-    print(f"searched {cnt} paths")
-    print("solution:", solution)
-    return solution
+def astar(state, *args, **kwargs):
+    """Run A* search on the cube and return the solution path (see solver.astar),
+    with the sticker heuristic of cost() below."""
+    return solver.astar(state, *args, scale=SCALE, **kwargs)
+
+
+def idastar(state, *args, **kwargs):
+    """Run IDA* search on the cube and return the solution path (see
+    solver.idastar), with the sticker heuristic of cost() below."""
+    return solver.idastar(state, *args, scale=SCALE, **kwargs)
+
+
+def bidirectional(state, *args, **kwargs):
+    """Run bidirectional A* search on the cube and return the solution path (see
+    solver.bidirectional), with the sticker heuristic of cost() below."""
+    return solver.bidirectional(state, *args, scale=SCALE, **kwargs)
+
+
+path_string = solver.path_string
+
+
+# cost() divides the misplaced stickers by this; the searches get the same h
+# from heuristics.select()
+SCALE = 6
 
 
 def cost(node, state):
@@ -146,7 +275,7 @@ def cost(node, state):
         for j in range(i - 4, i + 4):
             if state[j] != state[i]:
                 h += 1
-    h = h / 6
+    h = h / SCALE
 
     return g + h
 
@@ -205,409 +334,8 @@ def guisetup(params):
 
 
 def rotate(state, face, direction="CW"):
-    """Rotate the cube face (U/D/L/R/B/F) in a given direction (CW/CCW)."""
-    if face == "U":
-        src = [9, 10, 11, 18, 19, 20, 27, 28, 29, 36, 37, 38, 0, 1, 2, 5, 8, 7, 6, 3]
-        if direction == "CW":
-            dst = [
-                36,
-                37,
-                38,
-                9,
-                10,
-                11,
-                18,
-                19,
-                20,
-                27,
-                28,
-                29,
-                2,
-                5,
-                8,
-                7,
-                6,
-                3,
-                0,
-                1,
-            ]
-        elif direction == "CCW":
-            dst = [
-                18,
-                19,
-                20,
-                27,
-                28,
-                29,
-                36,
-                37,
-                38,
-                9,
-                10,
-                11,
-                6,
-                3,
-                0,
-                1,
-                2,
-                5,
-                8,
-                7,
-            ]
-
-    elif face == "D":
-        src = [
-            45,
-            46,
-            47,
-            50,
-            53,
-            52,
-            51,
-            48,
-            15,
-            16,
-            17,
-            24,
-            25,
-            26,
-            33,
-            34,
-            35,
-            42,
-            43,
-            44,
-        ]
-        if direction == "CW":
-            dst = [
-                47,
-                50,
-                53,
-                52,
-                51,
-                48,
-                45,
-                46,
-                24,
-                25,
-                26,
-                33,
-                34,
-                35,
-                42,
-                43,
-                44,
-                15,
-                16,
-                17,
-            ]
-        elif direction == "CCW":
-            dst = [
-                51,
-                48,
-                45,
-                46,
-                47,
-                50,
-                53,
-                52,
-                42,
-                43,
-                44,
-                15,
-                16,
-                17,
-                24,
-                25,
-                26,
-                33,
-                34,
-                35,
-            ]
-
-    elif face == "L":
-        src = [
-            0,
-            3,
-            6,
-            18,
-            21,
-            24,
-            45,
-            48,
-            51,
-            38,
-            41,
-            44,
-            9,
-            10,
-            11,
-            12,
-            14,
-            15,
-            16,
-            17,
-        ]
-        if direction == "CW":
-            dst = [
-                18,
-                21,
-                24,
-                45,
-                48,
-                51,
-                44,
-                41,
-                38,
-                6,
-                3,
-                0,
-                11,
-                14,
-                17,
-                10,
-                16,
-                9,
-                12,
-                15,
-            ]
-        elif direction == "CCW":
-            dst = [
-                44,
-                41,
-                38,
-                0,
-                3,
-                6,
-                18,
-                21,
-                24,
-                51,
-                48,
-                45,
-                15,
-                12,
-                9,
-                16,
-                10,
-                17,
-                14,
-                11,
-            ]
-
-    elif face == "R":
-        src = [
-            2,
-            5,
-            8,
-            20,
-            23,
-            26,
-            47,
-            50,
-            53,
-            36,
-            39,
-            42,
-            27,
-            28,
-            29,
-            30,
-            32,
-            33,
-            34,
-            35,
-        ]
-        if direction == "CW":
-            dst = [
-                42,
-                39,
-                36,
-                2,
-                5,
-                8,
-                20,
-                23,
-                26,
-                53,
-                50,
-                47,
-                29,
-                32,
-                35,
-                28,
-                34,
-                27,
-                30,
-                33,
-            ]
-        elif direction == "CCW":
-            dst = [
-                20,
-                23,
-                26,
-                47,
-                50,
-                53,
-                42,
-                39,
-                36,
-                8,
-                5,
-                2,
-                33,
-                30,
-                27,
-                34,
-                28,
-                35,
-                32,
-                29,
-            ]
-
-    elif face == "B":
-        src = [
-            36,
-            37,
-            38,
-            41,
-            44,
-            43,
-            42,
-            39,
-            2,
-            1,
-            0,
-            9,
-            12,
-            15,
-            51,
-            52,
-            53,
-            35,
-            32,
-            29,
-        ]
-        if direction == "CW":
-            dst = [
-                38,
-                41,
-                44,
-                43,
-                42,
-                39,
-                36,
-                37,
-                9,
-                12,
-                15,
-                51,
-                52,
-                53,
-                35,
-                32,
-                29,
-                2,
-                1,
-                0,
-            ]
-        elif direction == "CCW":
-            dst = [
-                42,
-                39,
-                36,
-                37,
-                38,
-                41,
-                44,
-                43,
-                35,
-                32,
-                29,
-                2,
-                1,
-                0,
-                9,
-                12,
-                15,
-                51,
-                52,
-                53,
-            ]
-
-    elif face == "F":
-        src = [
-            18,
-            19,
-            20,
-            23,
-            26,
-            25,
-            24,
-            21,
-            6,
-            7,
-            8,
-            27,
-            30,
-            33,
-            47,
-            46,
-            45,
-            17,
-            14,
-            11,
-        ]
-        if direction == "CW":
-            dst = [
-                20,
-                23,
-                26,
-                25,
-                24,
-                21,
-                18,
-                19,
-                27,
-                30,
-                33,
-                47,
-                46,
-                45,
-                17,
-                14,
-                11,
-                6,
-                7,
-                8,
-            ]
-        elif direction == "CCW":
-            dst = [
-                24,
-                21,
-                18,
-                19,
-                20,
-                23,
-                26,
-                25,
-                17,
-                14,
-                11,
-                6,
-                7,
-                8,
-                27,
-                30,
-                33,
-                47,
-                46,
-                45,
-            ]
-
-    temp = state.copy()
-    for i, j in zip(src, dst):
-        state[j] = temp[i]
+    """Rotate the cube face (U/D/L/R/B/F) in a given direction (CW/CCW/180)."""
+    state[:] = cube.apply(state, cube.move_name(face, direction))
 
 
 def recolor(gui, state, params):
@@ -628,11 +356,11 @@ def recolor(gui, state, params):
 
 def simulate(state, node):
     """Simulate rotating the cube from an input state to determine resulting state.
-    The input node is a sequence of rotations."""
-    s = state.copy()  # copy the state so that we don't change the actual cube!
+    The input node is a sequence of rotations. The result is a compact state (bytes)."""
+    s = cube.pack(state)  # a new compact copy, so we don't change the actual cube!
     # ***ENTER CODE HERE***  (4 lines)
     for face in node:
-        rotate(s, face.upper(), "CCW" if face.isupper() else "CW")
+        s = cube.apply(s, face)
 
     return s
 
@@ -0,0 +1,512 @@
+# search.py
+# Bookkeeping shared by the pancake and Rubik's cube searches.
+
+from array import array
+from collections import deque
+import hashlib
+import heapq
+from itertools import islice
+import math
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # not on Windows, where max_memory is not checked
+    resource = None
+
+ROOT = 255  # move byte stored for the root node, which has no move
+
+# How entries with equal priority are ordered: by insertion order ("fifo" or
+# "lifo"), deepest g first ("deep"), or lowest h first ("low-h"). Remaining
+# ties are broken first-in first-out.
+TIEBREAKS = ("fifo", "lifo", "deep", "low-h")
+
+
+class NodeTable:
+    """Parent index and last move of every generated node, in two flat arrays.
+    Nodes are numbered in the order they are added, starting with the root at 0,
+    so a frontier entry only needs to carry its node number and state. Moves are
+    small integers (0-254) chosen by the caller."""
+
+    def __init__(self):
+        self.parents = array("q")
+        self.moves = bytearray()
+
+    def __len__(self):
+        return len(self.moves)
+
+    def add(self, parent=-1, move=ROOT):
+        """Record a node reached from node number parent by move and return its number."""
+        self.parents.append(parent)
+        self.moves.append(move)
+        return len(self.moves) - 1
+
+    def path(self, index):
+        """Return the list of moves leading from the root to node number index."""
+        path = []
+        while self.parents[index] >= 0:
+            path.append(self.moves[index])
+            index = self.parents[index]
+        return path[::-1]
+
+
+class Zobrist:
+    """64-bit Zobrist hashes of fixed-length states of small integers: the xor of
+    one random key per (position, value). When a move changes only some
+    positions, the hash is updated from those alone (see update()). The keys
+    come from a fixed seed, so hashes are the same in every process."""
+
+    def __init__(self, length, values, seed=0):
+        rng = random.Random(seed)
+        self.keys = [
+            [rng.getrandbits(64) for _ in range(values)] for _ in range(length)
+        ]
+
+    def hash(self, state):
+        """Return the hash of a state, looking at every position."""
+        h = 0
+        for key, value in zip(self.keys, state):
+            h ^= key[value]
+        return h
+
+    def update(self, h, state, positions, sources):
+        """Return the hash of the state a move leads to from a state with hash h,
+        where the move puts the value at each of sources into the position at the
+        same place in positions, and leaves every other position alone."""
+        keys = self.keys
+        for j, k in zip(positions, sources):
+            h ^= keys[j][state[j]] ^ keys[j][state[k]]
+        return h
+
+
+class ZobristSet:
+    """Set of states keyed by their Zobrist hash, mapped to the state itself so a
+    lookup is verified against the full state. States whose hash collides with
+    one already present are kept in a plain set instead."""
+
+    def __init__(self):
+        self._states = {}  # hash -> state
+        self._collided = set()
+
+    def __len__(self):
+        return len(self._states) + len(self._collided)
+
+    def add(self, h, state):
+        """Add a state with hash h."""
+        other = self._states.setdefault(h, state)
+        if other != state:
+            self._collided.add(state)
+
+    def contains(self, h, state):
+        """Return whether a state with hash h is in the set."""
+        return self._states.get(h) == state or (
+            bool(self._collided) and state in self._collided
+        )
+
+    def discard(self, h, state):
+        """Remove a state with hash h if it is in the set."""
+        if self._states.get(h) == state:
+            del self._states[h]
+        else:
+            self._collided.discard(state)
+
+
+class BloomFilter:
+    """Blocked Bloom filter: an approximate set of bytes keys, for a closed list
+    too big to keep exactly. Each key sets k bits in one 64-byte block (a cache
+    line) picked by its hash, and the filter is sized for capacity keys at the
+    given false-positive rate. A key added is always found, but a false positive
+    makes a search skip a state it never expanded, which can cost optimality."""
+
+    BLOCK = 512  # bits per block
+
+    def __init__(self, capacity, error_rate=0.001):
+        # Keys fall unevenly into blocks, which raises the false-positive rate
+        # of a blocked filter, so it is sized for half the rate asked for
+        bits = -capacity * math.log(error_rate / 2) / math.log(2) ** 2
+        self.blocks = max(1, math.ceil(bits / self.BLOCK))
+        self.k = min(12, max(1, round(bits / capacity * math.log(2))))
+        self.bits = bytearray(self.blocks * self.BLOCK // 8)
+        self._len = 0
+
+    def __len__(self):
+        """Return the number of keys added (counting any added twice)."""
+        return self._len
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def _positions(self, key):
+        # The last 8 bytes of a 32-byte hash pick the block, and each 16-bit
+        # word before them one bit in it
+        digest = hashlib.blake2b(key, digest_size=32).digest()
+        base = int.from_bytes(digest[24:], "little") % self.blocks * self.BLOCK
+        return [base + (word & 511) for word in array("H", digest[: 2 * self.k])]
+
+    def add(self, key):
+        """Add a key."""
+        bits = self.bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+        self._len += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[p >> 3] >> (p & 7) & 1 for p in self._positions(key))
+
+
+def set_bytes(count, key):
+    """Return about how many bytes a set of count keys like key takes: its hash
+    table (16 bytes a slot, grown to stay under 3/5 full) and the keys."""
+    slots = 8
+    while slots * 3 <= count * 5:
+        slots *= 4 if count < 50000 else 2
+    return sys.getsizeof(set()) + slots * 16 + count * sys.getsizeof(key)
+
+
+class Budget:
+    """Limits that stop a search early: nodes expanded, seconds of wall-clock time
+    (counted from when the budget is made), open list length and peak resident
+    memory in bytes. A limit of None is not checked."""
+
+    CHECK_EVERY = 256  # nodes between looks at the clock and memory
+
+    def __init__(
+        self, max_nodes=None, seconds=None, max_frontier=None, max_memory=None
+    ):
+        self.max_nodes = max_nodes
+        self.deadline = None if seconds is None else time.perf_counter() + seconds
+        self.max_frontier = max_frontier
+        self.max_memory = max_memory if resource else None
+
+    def exceeded(self, nodes, frontier, memory=None):
+        """Return which limit ("nodes", "time", "frontier" or "memory") a search
+        that has expanded nodes and has frontier entries open has reached, or None.
+        The clock and this process's memory are looked at every CHECK_EVERY nodes;
+        a caller that gives the memory in use (e.g. summed over processes) has
+        both checked on every call."""
+        if self.max_nodes is not None and nodes >= self.max_nodes:
+            return "nodes"
+        if self.max_frontier is not None and frontier >= self.max_frontier:
+            return "frontier"
+        if memory is None and nodes % self.CHECK_EVERY:
+            return None
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return "time"
+        if self.max_memory is not None:
+            if memory is None:
+                memory = peak_memory()
+            if memory >= self.max_memory:
+                return "memory"
+        return None
+
+
+def peak_memory():
+    """Return the peak resident memory of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux counts KiB
+
+
+def _tie(tiebreak, g, h):
+    """Return the secondary sort key of an entry under a tie-breaking rule."""
+    if tiebreak == "deep":
+        return -g
+    elif tiebreak == "low-h":
+        return h
+    return 0
+
+
+class HeapOpenList:
+    """Open list backed by heapq. Unlike queue.PriorityQueue it takes no locks
+    and never compares the items themselves."""
+
+    def __init__(self, tiebreak="fifo"):
+        if tiebreak not in TIEBREAKS:
+            raise ValueError(f"unknown tie-breaking rule {tiebreak!r}")
+        self.tiebreak = tiebreak
+        self._heap = []
+        self._count = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, item, priority, g=0, h=0):
+        """Add an item with a priority (lower comes out first) and its g and h values."""
+        self._count += 1
+        order = -self._count if self.tiebreak == "lifo" else self._count
+        heapq.heappush(self._heap, (priority, _tie(self.tiebreak, g, h), order, item))
+
+    def pop(self):
+        """Remove and return the item with the lowest priority."""
+        return heapq.heappop(self._heap)[-1]
+
+    def items(self):
+        """Return an iterator over the items, in the order they would be popped."""
+        return (entry[-1] for entry in sorted(self._heap))
+
+
+class BucketOpenList:
+    """Open list with one FIFO/LIFO bucket per distinct (priority, tie) key.
+    The search costs here take only a few distinct values, so a small heap of
+    keys plus O(1) appends and pops within a bucket beats a heap of entries."""
+
+    def __init__(self, tiebreak="fifo"):
+        if tiebreak not in TIEBREAKS:
+            raise ValueError(f"unknown tie-breaking rule {tiebreak!r}")
+        self.tiebreak = tiebreak
+        self._buckets = {}  # key -> deque of items; every key is also in _keys
+        self._keys = []  # heap of bucket keys
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def push(self, item, priority, g=0, h=0):
+        """Add an item with a priority (lower comes out first) and its g and h values."""
+        self._append((priority, _tie(self.tiebreak, g, h)), item)
+
+    def _append(self, key, item):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = deque()
+            heapq.heappush(self._keys, key)
+        bucket.append(item)
+        self._len += 1
+
+    def _first_key(self):
+        # The lowest key with a non-empty bucket (the list must not be empty);
+        # buckets emptied by pop() are only dropped here
+        while not self._buckets[self._keys[0]]:
+            del self._buckets[heapq.heappop(self._keys)]
+        return self._keys[0]
+
+    def pop(self):
+        """Remove and return an item with the lowest priority."""
+        self._len -= 1
+        bucket = self._buckets[self._first_key()]
+        return bucket.pop() if self.tiebreak == "lifo" else bucket.popleft()
+
+    def items(self):
+        """Yield the items, in the order they would be popped."""
+        for key in sorted(self._buckets):
+            bucket = self._buckets[key]
+            yield from reversed(bucket) if self.tiebreak == "lifo" else bucket
+
+
+class SpillingOpenList:
+    """Open list that keeps at most about limit entries in memory. When a push
+    goes over the limit, the worst buckets of its in-memory BucketOpenList are
+    written to a run file on disk, sorted by key. Once every entry left in
+    memory is worse than the best one on disk, the runs are memory-mapped and
+    merged from where each was last read: the best limit / 2 entries come back
+    into memory, after the worst in memory are spilled to make room. Once there
+    are more than MAX_RUNS runs, the smallest are merged into one, so each
+    entry is rewritten only a few times. Duplicates (equal key and state) are
+    dropped on the way.
+
+    Items are tuples packed with the struct format fmt, whose last field is the
+    state (e.g. "qqd54s" for a node number, g, h and a 54-byte state). Run files
+    go in a temporary directory under directory, removed by close()."""
+
+    MAX_RUNS = 16  # run files kept before they are merged into one
+    CHUNK = 4096  # records read from a run file at a time
+
+    def __init__(self, tiebreak="fifo", limit=1_000_000, fmt="qqd54s", directory=None):
+        if tiebreak not in TIEBREAKS:
+            raise ValueError(f"unknown tie-breaking rule {tiebreak!r}")
+        self.tiebreak = tiebreak
+        self.limit = max(2, limit)
+        self._memory = BucketOpenList(tiebreak)
+        self._record = struct.Struct("<dd" + fmt)  # key, then the item
+        self._directory = tempfile.mkdtemp(prefix="openlist-", dir=directory)
+        self._runs = []  # [filename, entries read, entries] of each run file
+        self._spilled = 0
+        self._best_spilled = None  # lowest key on disk
+        self._files = 0
+        self.spills = self.reloads = 0
+        self.bytes_written = 0
+
+    def __len__(self):
+        return len(self._memory) + self._spilled
+
+    def push(self, item, priority, g=0, h=0):
+        """Add an item with a priority (lower comes out first) and its g and h values."""
+        self._memory.push(item, priority, g, h)
+        if len(self._memory) > self.limit:
+            self._spill(self.limit // 2)
+
+    def pop(self):
+        """Remove and return an item with the lowest priority."""
+        if self._runs and (
+            not self._memory or self._memory._first_key() > self._best_spilled
+        ):
+            self._reload()
+        return self._memory.pop()
+
+    def items(self):
+        """Yield the items, those in memory first and then those on disk."""
+        yield from self._memory.items()
+        size = self._record.size
+        for filename, start, _ in self._runs:
+            with open(filename, "rb") as file:
+                file.seek(start * size)
+                while data := file.read(self.CHUNK * size):
+                    for record in self._record.iter_unpack(data):
+                        yield record[2:]
+
+    def memory_items(self):
+        """Yield the items kept in memory, in the order they would be popped."""
+        return self._memory.items()
+
+    def runs(self):
+        """Return the number of entries left on disk in each run file."""
+        return [count - start for _, start, count in self._runs]
+
+    def copy_runs(self, file):
+        """Write the records left in every run file to an open binary file, one run
+        after another, without reading them into memory (see add_run())."""
+        for filename, start, _ in self._runs:
+            with open(filename, "rb") as run:
+                run.seek(start * self._record.size)
+                shutil.copyfileobj(run, file)
+
+    def add_run(self, file, count):
+        """Read count records written by copy_runs() from an open binary file into a
+        new run file."""
+        if not count:
+            return
+        size = self._record.size
+        filename = os.path.join(self._directory, f"run{self._files}.bin")
+        self._files += 1
+        with open(filename, "wb") as run:
+            left = count * size
+            while left:
+                data = file.read(min(left, self.CHUNK * size))
+                if not data:
+                    raise ValueError("the run ends early")
+                if left == count * size:
+                    head = self._record.unpack_from(data)[:2]
+                    if self._best_spilled is None or head < self._best_spilled:
+                        self._best_spilled = head
+                run.write(data)
+                left -= len(data)
+        self._runs.append([filename, 0, count])
+        self._spilled += count
+
+    def close(self):
+        """Remove the run files."""
+        shutil.rmtree(self._directory, ignore_errors=True)
+        self._runs, self._spilled = [], 0
+
+    def _spill(self, keep):
+        # Keep the best buckets, up to keep entries (at least one of them), and
+        # write the rest to a run
+        memory = self._memory
+        keys = sorted(key for key, bucket in memory._buckets.items() if bucket)
+        sizes = [len(memory._buckets[key]) for key in keys]
+        kept, i = sizes[0], 1
+        while i < len(keys) and kept + sizes[i] <= keep:
+            kept += sizes[i]
+            i += 1
+        if i == len(keys):
+            return  # a single bucket over the limit stays in memory
+        self._write((key, item) for key in keys[i:] for item in memory._buckets[key])
+        memory._keys = keys[:i]  # sorted, so a valid heap
+        memory._buckets = {key: memory._buckets[key] for key in keys[:i]}
+        memory._len = kept
+        self.spills += 1
+
+    def _write(self, records):
+        # Write (key, item) records, in key order, to a new run file
+        filename = os.path.join(self._directory, f"run{self._files}.bin")
+        self._files += 1
+        pack = self._record.pack
+        count = 0
+        with open(filename, "wb") as file:
+            for (priority, tie), item in records:
+                if count == 0 and (
+                    self._best_spilled is None or (priority, tie) < self._best_spilled
+                ):
+                    self._best_spilled = (priority, tie)
+                file.write(pack(priority, tie, *item))
+                count += 1
+        if count:
+            self._runs.append([filename, 0, count])
+            self._spilled += count
+            self.bytes_written += count * self._record.size
+        else:
+            os.remove(filename)
+
+    def _merged(self, maps, runs):
+        # Yield (key, item) for the unread records of the runs numbered runs in
+        # key order, skipping duplicates, moving each run's offset past what is
+        # taken
+        record, size = self._record, self._record.size
+        heap = []
+        for r in runs:
+            _, start, count = self._runs[r]
+            if start < count:
+                head = record.unpack_from(maps[r], start * size)
+                heap.append((head[:2], r, head))
+        heapq.heapify(heap)
+        key, states = None, set()
+        while heap:
+            k, r, head = heapq.heappop(heap)
+            run = self._runs[r]
+            run[1] += 1
+            self._spilled -= 1
+            if run[1] < run[2]:
+                after = record.unpack_from(maps[r], run[1] * size)
+                heapq.heappush(heap, (after[:2], r, after))
+            if k != key:
+                key, states = k, set()
+            if head[-1] not in states:
+                states.add(head[-1])
+                yield k, head[2:]
+
+    def _reload(self):
+        # Bring back the best limit / 2 entries from the heads of the runs, and
+        # once there are more than MAX_RUNS runs, merge the smallest half into one
+        batch = self.limit // 2
+        if len(self._memory) + batch > self.limit:
+            self._spill(self.limit - batch)
+        maps = []
+        for filename, _, _ in self._runs:
+            with open(filename, "rb") as file:
+                maps.append(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        try:
+            merged = self._merged(maps, range(len(self._runs)))
+            for key, item in islice(merged, batch):
+                self._memory._append(key, item)
+            merged.close()
+            if len(self._runs) > self.MAX_RUNS:
+                left = lambda r: self._runs[r][2] - self._runs[r][1]
+                smallest = sorted(range(len(self._runs)), key=left)
+                self._write(self._merged(maps, smallest[: self.MAX_RUNS // 2 + 1]))
+        finally:
+            for m in maps:
+                m.close()
+
+        for filename, start, count in self._runs:
+            if start == count:
+                os.remove(filename)
+        self._runs = [run for run in self._runs if run[1] < run[2]]
+        self._best_spilled = None
+        for filename, start, _ in self._runs:
+            with open(filename, "rb") as file:
+                file.seek(start * self._record.size)
+                head = self._record.unpack(file.read(self._record.size))[:2]
+            if self._best_spilled is None or head < self._best_spilled:
+                self._best_spilled = head
+        self.reloads += 1
+
+
+OPEN_LISTS = {"heap": HeapOpenList, "bucket": BucketOpenList}
@@ -0,0 +1,470 @@
+# solver.py
+# The cube searches shared by rubiks.py and rubiks_bonus.py, which differ only in
+# the scale of the sticker heuristic (misplaced stickers / 6 or / 12).
+
+from array import array
+import checkpoint
+import cube
+import cubie
+import endgame
+import heuristics
+from operator import ne
+import search
+import signal
+import threading
+import time
+
+
+def budget(args):
+    """Return the search.Budget set by the command line, starting now, or None
+    if no limit is set."""
+    limits = (args.max_nodes, args.time_limit, args.max_frontier, args.max_memory)
+    if all(limit is None for limit in limits):
+        return None
+    return search.Budget(
+        args.max_nodes,
+        args.time_limit,
+        args.max_frontier,
+        args.max_memory and args.max_memory * 2**20,
+    )
+
+
+def bloom(args):
+    """Return the closed list set by the command line: a search.BloomFilter, or
+    None for an exact set."""
+    if args.bloom:
+        return search.BloomFilter(args.bloom, args.bloom_error)
+    return None
+
+
+def astar(
+    state,
+    verbose=False,
+    open_list="bucket",
+    tiebreak="deep",
+    heuristic="stickers",
+    metric="qtm",
+    symmetry=False,
+    endgame_depth=0,
+    stats=None,
+    workers=1,
+    budget=None,
+    batch=0,
+    zobrist=False,
+    closed=None,
+    spill=None,
+    spill_dir=None,
+    checkpoint_file=None,
+    checkpoint_every=300,
+    resume=False,
+    scale=6,
+):
+    """Run A* search on the cube based on its current state and return the solution path.
+
+    open_list: "heap" or "bucket"; tiebreak: "fifo", "lifo", "deep" or "low-h"
+        (see search.py).
+    heuristic: "stickers" (misplaced stickers / scale) or a pattern database,
+        "corners", "edges" or "max" (see pattern_db.py); metric: "qtm" or "htm".
+    symmetry: key the closed list by cube.canonical() (corners only).
+    endgame_depth: stop at the first state in the endgame.py table this deep.
+    workers, batch: hand the search to hda.py or expand.py.
+    budget: a search.Budget; when it runs out, the path to the state with the
+        lowest h is returned.
+    zobrist: key the closed list by Zobrist hashes (see search.Zobrist).
+    closed: a search.BloomFilter to use as the closed list (may cost optimality).
+    spill, spill_dir: keep about spill open list entries in memory and the rest
+        on disk (see search.SpillingOpenList).
+    checkpoint_file, checkpoint_every, resume: save the search every so many
+        seconds and when it stops early, and go on from the saved one.
+    stats: a dict that gets status ("solved", "exhausted" or the budget limit),
+        nodes, frontier, seconds, closed_bytes and exact_bytes; spills, reloads
+        and bytes_spilled with spill; checkpoints, checkpoint_seconds and
+        checkpoint_bytes with checkpoint_file; best_h, best_path and best_state
+        when unsolved.
+    """
+    if symmetry and heuristic not in heuristics.SYMMETRIC:
+        raise ValueError(f"symmetry can't be used with the {heuristic} heuristic")
+    if workers > 1 or batch:
+        # hda.py and expand.py run searches of their own, without these options
+        unsupported = {
+            "batch": batch and workers > 1,
+            "open_list": open_list != "bucket",
+            "tiebreak": tiebreak != "deep",
+            "symmetry": symmetry and workers > 1,
+            "endgame_depth": endgame_depth,
+            "budget": budget is not None and workers <= 1,
+            "zobrist": zobrist,
+            "closed": closed is not None,
+            "spill": spill,
+            "checkpoint_file": checkpoint_file,
+            "resume": resume,
+        }
+        names = [name for name, used in unsupported.items() if used]
+        if names:
+            mode = "workers" if workers > 1 else "batch"
+            raise ValueError(f"{mode} can't be combined with {', '.join(names)}")
+    if workers > 1:
+        import hda  # imported here since hda uses path_string() below
+
+        return hda.astar(
+            state, workers, verbose, heuristic, metric, stats, scale, budget
+        )
+    if batch:
+        import expand  # imported here since expand uses path_string() below
+
+        return expand.astar(
+            state, batch, verbose, heuristic, metric, symmetry, stats, scale
+        )
+    print("Running A* search...")
+    # ***ENTER CODE HERE*** (20-25 lines)
+    # Open list items are (node number, g, h, state), ordered by f. The node table
+    # keeps just the parent number and move (an index into cube.MOVES)
+    # of each node, so the path is only built once, at the goal. States are
+    # compact bytes (see cube.py and cubie.py), so the closed list can be a
+    # set. Colors are normalized first so the goal is always model.SOLVED.
+    model, convert, estimate = heuristics.select(heuristic, metric, scale)
+    start = convert(state)
+    if model is cube:
+
+        def step(s, h, move, child):
+            # The same h, updated from the parent's with the stickers moved
+            count = round(h * scale)
+            return heuristics.MISPLACED.after(s, count, cube.MOVES[move]) / scale
+
+    else:
+        step = lambda s, h, move, child: estimate(child)
+    costs = cube.METRICS[metric]
+    key = model.canonical if symmetry else bytes
+    if zobrist:
+        # A move changes 20 stickers, so their keys update the parent's hash;
+        # canonical states and cubie translations can't be followed that way
+        if model is not cube or symmetry:
+            raise ValueError("zobrist needs the stickers heuristic and symmetry=False")
+        if closed is not None:
+            raise ValueError("zobrist keys can't go in a Bloom filter")
+        zob = search.Zobrist(len(start), 6)
+        hashes = array("Q", [zob.hash(start)])  # by node number, as in nodes
+    table = None
+    if endgame_depth:
+        # States near solved have their exact distance in the table, and every
+        # other state is more than endgame_depth moves away
+        table = endgame.EndgameTable(endgame_depth, metric)
+        as_cubies = cubie.from_stickers if model is cube else bytes
+        base = estimate
+
+        def estimate(s):
+            d = table.distance(as_cubies(s))
+            return max(base(s), endgame_depth + 1) if d is None else d
+
+        step = lambda s, h, move, child: estimate(child)
+
+    cnt = 0
+    fmt = f"qqd{len(start)}s"  # packs the open list items, for files
+    handler = None  # the SIGINT handler to restore, if replaced below
+    if spill:
+        pq = search.SpillingOpenList(tiebreak, spill, fmt, spill_dir)
+    else:
+        pq = search.OPEN_LISTS[open_list](tiebreak)
+    try:
+        if closed is not None:
+            visited = closed
+        else:
+            visited = search.ZobristSet() if zobrist else set()
+        status = "exhausted"
+        solution = []
+
+        # A checkpoint can only be resumed by a search with the same options
+        options = dict(
+            start=start.hex(),
+            heuristic=heuristic,
+            metric=metric,
+            symmetry=symmetry,
+            endgame_depth=endgame_depth,
+            closed="set" if closed is None else "bloom",
+        )
+        saves = []  # (seconds, bytes) of each checkpoint written
+        if checkpoint_file and zobrist:
+            raise ValueError("checkpoints can't hold zobrist keys")
+        if resume and not checkpoint_file:
+            raise ValueError("resume needs a checkpoint_file")
+        if resume:
+            header, nodes, visited = checkpoint.load(checkpoint_file, pq, fmt)
+            if header["options"] != options:
+                raise ValueError(
+                    f"{checkpoint_file} was saved by a search with other options"
+                )
+            cnt = header["expanded"]
+            best_state = bytes.fromhex(header["best_state"])
+            best = (header["best_h"], header["best_node"], best_state)
+            t = time.perf_counter() - header["seconds"]
+            print(f"resumed from {checkpoint_file} after {cnt} paths")
+        else:
+            nodes = search.NodeTable()
+            pq.push((nodes.add(), 0, estimate(start), start), estimate(start))
+            # The lowest h generated: (h, node number, state)
+            best = (estimate(start), 0, start)
+            t = time.perf_counter()
+        next_save = time.perf_counter() + checkpoint_every
+
+        def save():
+            header = dict(
+                options=options,
+                expanded=cnt,
+                best_h=best[0],
+                best_node=best[1],
+                best_state=best[2].hex(),
+                seconds=time.perf_counter() - t,
+            )
+            began = time.perf_counter()
+            size = checkpoint.save(checkpoint_file, header, nodes, pq, visited, fmt)
+            saves.append((time.perf_counter() - began, size))
+            print(f"checkpoint: {size / 2**20:.1f} MB written in {saves[-1][0]:.2f} s")
+
+        # With a checkpoint file, Ctrl-C stops the search between nodes, so what is
+        # saved is whole; it is raised again once the checkpoint is written
+        interrupted = []
+        if checkpoint_file and threading.current_thread() is threading.main_thread():
+            handler = signal.signal(signal.SIGINT, lambda *_: interrupted.append(1))
+        while pq:
+            limit = budget and budget.exceeded(cnt, len(pq))
+            if interrupted:
+                limit = "interrupted"
+            if limit:
+                status = limit
+                break
+            if checkpoint_file and cnt % 256 == 0 and time.perf_counter() >= next_save:
+                save()
+                next_save = time.perf_counter() + checkpoint_every
+            index, g, temp_h, temp_state = pq.pop()
+            if zobrist:
+                visited.add(hashes[index], temp_state)
+            else:
+                visited.add(key(temp_state))
+            if verbose:
+                print(f"Looking at path {path_string(nodes.path(index))}")
+            cnt += 1
+            if table and table.distance(as_cubies(temp_state)) is not None:
+                # The table has the rest of the way (no moves if temp_state is solved)
+                suffix = table.solution(as_cubies(temp_state))
+                moves = nodes.path(index) + [cube.MOVES.index(move) for move in suffix]
+                solution = path_string(moves)
+                status = "solved"
+                break
+            if temp_state != model.SOLVED:
+                # only canonical move sequences (see cube.SUCCESSORS)
+                for move in cube.successors(nodes.moves[index]):
+                    child = model.apply(temp_state, cube.MOVES[move])
+                    if zobrist:
+                        changes = cube.CHANGES[cube.MOVES[move]]
+                        z = zob.update(hashes[index], temp_state, *changes)
+                        seen = visited.contains(z, child)
+                    else:
+                        seen = key(child) in visited
+                    if not seen:
+                        h = step(temp_state, temp_h, move, child)
+                        g2 = g + costs[move]
+                        child_index = nodes.add(index, move)
+                        if zobrist:
+                            hashes.append(z)
+                        pq.push((child_index, g2, h, child), g2 + h, g2, h)
+                        if h < best[0]:
+                            best = (h, child_index, child)
+            else:
+                solution = path_string(nodes.path(index))
+                status = "solved"
+                break
+
+        if checkpoint_file and status not in ("solved", "exhausted"):
+            save()  # so a search stopped early can be resumed from here
+        if interrupted:
+            raise KeyboardInterrupt
+        if status != "solved":
+            solution = path_string(nodes.path(best[1]))
+            print(f"stopped ({status}) at the closest state found, h = {best[0]:g}")
+        exact = search.set_bytes(len(visited), key(start))
+        if closed is not None:
+            print(
+                f"closed list: {closed.nbytes / 2**20:.1f} MB as a Bloom filter, "
+                f"about {exact / 2**20:.1f} MB as a set"
+            )
+        if stats is not None:
+            stats.update(
+                status=status,
+                nodes=cnt,
+                frontier=len(pq),
+                seconds=time.perf_counter() - t,
+                closed_bytes=exact if closed is None else closed.nbytes,
+                exact_bytes=exact,
+            )
+            if spill:
+                stats.update(
+                    spills=pq.spills, reloads=pq.reloads, bytes_spilled=pq.bytes_written
+                )
+            if checkpoint_file:
+                stats.update(
+                    checkpoints=len(saves),
+                    checkpoint_seconds=sum(seconds for seconds, _ in saves),
+                    checkpoint_bytes=saves[-1][1] if saves else 0,
+                )
+            if status != "solved":
+                stickers = best[2] if model is cube else cubie.to_stickers(best[2])
+                stats.update(
+                    best_h=best[0], best_path=solution, best_state=cube.unpack(stickers)
+                )
+        if spill:
+            print(
+                f"open list: {pq.spills} spills, {pq.reloads} reloads, "
+                f"{pq.bytes_written / 2**20:.1f} MB written"
+            )
+        print(f"searched {cnt} paths")
+        print("solution:", solution)
+        return solution
+    finally:
+        if handler is not None:
+            signal.signal(signal.SIGINT, handler)
+        if spill:
+            pq.close()  # even on an exception or Ctrl-C
+
+
+def idastar(
+    state, verbose=False, heuristic="stickers", metric="qtm", stats=None, scale=6
+):
+    """Run iterative-deepening A* search on the cube and return the solution path.
+    Only one cube state (changed in place and undone) and the current path are
+    kept, so memory is O(depth); nodes are re-expanded on each iteration instead.
+    If a stats dict is given, the number of nodes expanded is stored in it."""
+    print("Running IDA* search...")
+    model, convert, estimate = heuristics.select(heuristic, metric, scale)
+    start = convert(state)
+    costs = cube.METRICS[metric]
+    current = bytearray(start)
+    path = []  # move numbers (indices into cube.MOVES)
+    cnt = 0
+
+    def dfs(g, bound):
+        """Search below the current state; return None if solved, else the next bound."""
+        nonlocal cnt
+        f = g + estimate(current)
+        if f > bound:
+            return f
+        if verbose:
+            print(f"Looking at path {path_string(path)}")
+        cnt += 1
+        if current == model.SOLVED:
+            return None
+        next_bound = float("inf")
+        # only canonical move sequences (see cube.SUCCESSORS)
+        for move in cube.successors(path[-1] if path else None):
+            model.apply_inplace(current, cube.MOVES[move])
+            path.append(move)
+            result = dfs(g + costs[move], bound)
+            if result is None:
+                return None
+            next_bound = min(next_bound, result)
+            path.pop()
+            model.apply_inplace(current, cube.INVERSES[cube.MOVES[move]])
+        return next_bound
+
+    bound = estimate(current)
+    while bound != float("inf"):
+        before, t = cnt, time.perf_counter()
+        bound_reached = dfs(0, bound)
+        seconds = time.perf_counter() - t
+        print(
+            f"bound {bound:g}: {cnt - before} nodes in {seconds:.2f} s "
+            f"({(cnt - before) / max(seconds, 1e-9):,.0f} nodes/s)"
+        )
+        if bound_reached is None:
+            break
+        bound = bound_reached
+
+    solution = path_string(path)
+    if stats is not None:
+        stats["nodes"] = cnt
+    print(f"searched {cnt} paths")
+    print("solution:", solution)
+    return solution
+
+
+def bidirectional(
+    state, verbose=False, heuristic="stickers", metric="qtm", stats=None, scale=6
+):
+    """Run bidirectional A* search on the cube and return the solution path. One
+    side searches forward from the state to the solved cube and the other backward
+    from the solved cube to the state, each estimating the distance to its own end.
+    The side with the shorter open list is expanded next; the best path through a
+    state both sides have reached is kept until neither side can beat it. If a
+    stats dict is given, the nodes expanded on each side are stored in it."""
+    print("Running bidirectional A* search...")
+    model, convert, forward = heuristics.select(heuristic, metric, scale)
+    start = convert(state)
+    if model is cube:
+        # Stickers unlike the start's
+        backward = lambda s: sum(map(ne, s, start)) / scale
+    else:
+        # Getting from s to the start takes as many moves as solving the
+        # start's inverse followed by s
+        undo = cubie.inverse(start)
+        backward = lambda s: forward(cubie.compose(undo, s))
+    costs = cube.METRICS[metric]
+
+    # Side 0 is forward and side 1 backward. Open list items are (node number,
+    # g, f, state); seen maps each state a side has generated to the g and node
+    # number of the cheapest path found to it.
+    estimates = (forward, backward)
+    tables = (search.NodeTable(), search.NodeTable())
+    open_lists = (search.BucketOpenList("deep"), search.BucketOpenList("deep"))
+    seen = ({}, {})
+    cnt = [0, 0]
+    for side, root in enumerate((start, model.SOLVED)):
+        index, h = tables[side].add(), estimates[side](root)
+        seen[side][root] = (0, index)
+        open_lists[side].push((index, 0, h, root), h, 0, h)
+    best, meeting = (0, (0, 0)) if start == model.SOLVED else (float("inf"), None)
+    while open_lists[0] and open_lists[1]:
+        side = 0 if len(open_lists[0]) <= len(open_lists[1]) else 1
+        index, g, f, temp_state = open_lists[side].pop()
+        if f >= best:
+            break  # every path left on this side costs at least as much
+        if seen[side][temp_state][0] < g:
+            continue  # reached more cheaply since this entry was pushed
+        if verbose:
+            name = "backward" if side else "forward"
+            print(f"Looking at {name} path {path_string(tables[side].path(index))}")
+        cnt[side] += 1
+        # only canonical move sequences (see cube.SUCCESSORS)
+        for move in cube.successors(tables[side].moves[index]):
+            child = model.apply(temp_state, cube.MOVES[move])
+            g2 = g + costs[move]
+            if child in seen[side] and seen[side][child][0] <= g2:
+                continue
+            child_index = tables[side].add(index, move)
+            seen[side][child] = (g2, child_index)
+            if child in seen[1 - side]:
+                other_g, other_index = seen[1 - side][child]
+                if g2 + other_g < best:
+                    best = g2 + other_g
+                    meeting = (child_index, other_index)
+                    if side:
+                        meeting = meeting[::-1]
+            h = estimates[side](child)
+            open_lists[side].push((child_index, g2, g2 + h, child), g2 + h, g2, h)
+
+    solution = []
+    if meeting is not None:
+        # The backward moves lead from the solved cube to the meeting state, so
+        # undo them in reverse order to go on from there to the solved cube
+        moves = tables[0].path(meeting[0])
+        moves += [cube.UNDO[move] for move in reversed(tables[1].path(meeting[1]))]
+        solution = path_string(moves)
+    if stats is not None:
+        stats.update(nodes=sum(cnt), forward=cnt[0], backward=cnt[1])
+    print(f"searched {cnt[0]} paths forward and {cnt[1]} backward")
+    print("solution:", solution)
+    return solution
+
+
+def path_string(moves):
+    """Convert a list of move numbers from the node table into a path like "UrF",
+    with half turns spelled as two quarter turns ("rr")."""
+    return "".join(cube.SPELLINGS[move] for move in moves)
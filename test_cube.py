@@ -0,0 +1,53 @@
+# test_cube.py
+# Checks of the incremental sticker heuristic against rubiks.cost(); run with pytest.
+
+import random
+
+import pytest
+
+import cube
+import heuristics
+import rubiks
+import rubiks_bonus
+import search
+
+
+def scramble(moves, seed):
+    """Return the normalized state reached from SOLVED by random moves."""
+    rng = random.Random(seed)
+    state = cube.SOLVED
+    for _ in range(moves):
+        state = cube.apply(state, rng.choice(cube.MOVES))
+    return state
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_misplaced_after_matches_count(seed):
+    rng = random.Random(seed)
+    state = cube.SOLVED
+    count = heuristics.MISPLACED.count(state)
+    for _ in range(500):
+        move = rng.choice(cube.MOVES)
+        count = heuristics.MISPLACED.after(state, count, move)
+        state = cube.apply(state, move)
+        assert count == heuristics.MISPLACED.count(state)
+
+
+@pytest.mark.parametrize("module", [rubiks, rubiks_bonus])
+@pytest.mark.parametrize("seed", range(3))
+def test_astar_h_matches_cost(module, seed, monkeypatch):
+    pushed = []
+
+    class RecordingOpenList(search.BucketOpenList):
+        def push(self, item, priority, g=0, h=0):
+            pushed.append(item)
+            super().push(item, priority, g, h)
+
+    monkeypatch.setitem(search.OPEN_LISTS, "bucket", RecordingOpenList)
+    state = scramble(12, seed)
+    module.astar(list(state), budget=search.Budget(max_nodes=300))
+
+    assert len(pushed) > 300
+    for _, g, h, child in pushed:
+        # cost() of an empty path is h alone: misplaced stickers / 6, or / 12
+        assert h == pytest.approx(module.cost("", cube.unpack(child)))